@@ -1,5 +1,5 @@
 import typing
-import functools
+import collections
 import re
 import math
 
@@ -65,28 +65,73 @@ class CalcObject():
 
 		Представляется, как правило, строкой на листе таблицы (Spreadsheet) LibreOffice Calc.
 	"""
+	__slots__ = (
+		"_address",
+		"_flags",
+		"_description",
+		"_texput",
+		"_unit_texput",
+		"_text",
+		"_value",
+		"_value_type",
+		"_formula",
+		"_rare",
+	)
+
+	# Биты `_flags`: признаки, `subst_units + 1` (2 бита) и `digits_count + 2`
+	# (остальные биты)
+	IS_DISABLED = 1 << 0
+	IS_KNOWN = 1 << 1
+	IS_CONSTANT = 1 << 2
+	DO_NOT_PRINT = 1 << 3
+	IS_REDIRECT = 1 << 4
+	_SUBST_UNITS_SHIFT = 5
+	_DIGITS_COUNT_SHIFT = 7
+
 	def __init__(self, address: sp.Address) -> None:
 		self._address: sp.Address = address
-		self._source_name: str = ""
-		self._source_aux: str = ""
+		self._flags: int = 0
+		self._set_digits_count(-1)
+		self._set_subst_units(-1)
+
 		self._description: str = ""
 		self._texput: str = ""
 		self._unit_texput: str = ""
-		self._tex_equation: str = ""
-
-		self._is_disabled: bool = False
-		self._is_known: bool = False
-		self._is_constant: bool = False
-		self._do_not_print: bool = False
-		self._is_redirect: bool = False
-		self._digits_count: int = -1  # больше нуля = конкретное задание; -1 = по-умолчанию, если расчетная величина; -2 = по-умолчанию в любом случае
-		self._subst_units: int = -1  # -1 = по-умолчанию; 0 = нет; 1 = да
 
 		self._text: str = ""
 		self._value: 'float|None' = None
 		self._value_type: str = ""
 		self._formula: str = ""
 
+		# редко заполненные поля: `(source_name, source_aux, tex_equation)`;
+		# `tex_equation == None` - получается из формулы при первом обращении
+		# (см. `tex_equation()`)
+		self._rare: 'tuple[str, str, str|None]|None' = None
+
+	def _set_flag(self, flag: int, value: bool) -> None:
+		self._flags = self._flags | flag if value else self._flags & ~flag
+
+	def _set_digits_count(self, digits_count: int) -> None:
+		"""
+			`digits_count`: больше нуля = конкретное задание; `-1` = по-умолчанию, \
+			если расчетная величина; `-2` (и меньше) = по-умолчанию в любом случае.
+		"""
+		mask = (1 << self._DIGITS_COUNT_SHIFT) - 1
+		self._flags = self._flags & mask | (max(digits_count, -2) + 2) << self._DIGITS_COUNT_SHIFT
+
+	def _set_subst_units(self, subst_units: int) -> None:
+		"""
+			`subst_units`: `-1` = по-умолчанию; `1` = да; остальное = нет.
+		"""
+		subst_units = subst_units if subst_units in (-1, 1) else 0
+		self._flags = self._flags & ~(0b11 << self._SUBST_UNITS_SHIFT) | (subst_units + 1) << self._SUBST_UNITS_SHIFT
+
+	def _set_rare(self, source_name: str, source_aux: str, tex_equation: 'str|None') -> None:
+		if source_name == "" and source_aux == "" and tex_equation == "":
+			self._rare = None
+		else:
+			self._rare = (source_name, source_aux, tex_equation)
+
 	def is_empty(self) -> bool:
 		return \
 			self._text == "" \
@@ -96,25 +141,25 @@ class CalcObject():
 		return not self.is_constant()
 
 	def is_constant(self) -> bool:
-		return self._is_constant
+		return self._flags & self.IS_CONSTANT != 0
 
 	def is_known(self) -> bool:
-		return self._is_known
+		return self._flags & self.IS_KNOWN != 0
 
 	def is_redirect(self) -> bool:
-		return self._is_redirect
+		return self._flags & self.IS_REDIRECT != 0
 
 	def do_not_print(self) -> bool:
-		return self._do_not_print
+		return self._flags & self.DO_NOT_PRINT != 0
 
 	def address(self) -> sp.Address:
 		return self._address
 
 	def source_name(self) -> str:
-		return self._source_name
+		return "" if self._rare is None else self._rare[0]
 
 	def source_aux(self) -> str:
-		return self._source_aux
+		return "" if self._rare is None else self._rare[1]
 
 	def description(self) -> str:
 		return self._description
@@ -125,8 +170,18 @@ class CalcObject():
 	def unit_texput(self) -> str:
 		return self._unit_texput
 
-	def tex_equation(self) -> str:
-		return self._tex_equation
+	def tex_equation(self, cof: 'CalcObjectsFactory') -> str:
+		"""
+			`cof` - фабрика, создавшая величину: через неё `tex_equation` \
+			получается из формулы, если он не задан в таблице.
+		"""
+		if self._rare is None:
+			return ""
+		source_name, source_aux, tex_equation = self._rare
+		if tex_equation is None:
+			tex_equation = cof.ensure_tex_equation(self._formula, self._address.sheet())
+			self._rare = (source_name, source_aux, tex_equation)
+		return tex_equation
 
 	def text(self) -> str:
 		return self._text
@@ -141,84 +196,476 @@ class CalcObject():
 		return self._formula
 
 	def digits_count(self) -> int:
-		return self._digits_count
+		return (self._flags >> self._DIGITS_COUNT_SHIFT) - 2
 
 	def subst_units(self) -> int:
-		return self._subst_units
+		return (self._flags >> self._SUBST_UNITS_SHIFT & 0b11) - 1
+
+
+# Размеры кэшей `CalcObjectsFactory` по-умолчанию (`-1` - без ограничения)
+CALC_OBJECTS_CACHE_MAX_SIZE: int = 1 << 16
+HEADER_INDICES_CACHE_MAX_SIZE: int = 256
+FORMULAS_CACHE_MAX_SIZE: int = 1 << 14
+
+
+class CompiledFormula():
+	"""
+		Формула ячейки с листа `self_sheet`, разобранная один раз: её ссылки \
+		(`re_dependent_name`), ссылки на ячейки, диапазоны и именованные \
+		выражения в порядке появления без повторов (`names()`) и их адреса \
+		(`addresses()`), подстановки `#1`, `#2`... для них (`placeholders()`) \
+		и `tex_equation` по-умолчанию.
+
+		Адреса разбираются при первом обращении к ним.
+	"""
+	def __init__(self, formula_text: str, self_sheet: str, ss: sp.Spreadsheet) -> None:
+		self._formula: str = formula_text
+		self._self_sheet: str = self_sheet
+		self._ss: sp.Spreadsheet = ss
+
+		self._tokens: list[str] = re_dependent_name.findall(formula_text)
+		self._has_dependency: bool = any(
+			t.startswith("[") or ss.has_named_expression(t) for t in self._tokens
+		)
+
+		self._names: 'list[str]|None' = None
+		self._addresses: 'list[sp.Address|sp.AddressRange]|None' = None
+		self._placeholders: 'dict[str, str]|None' = None
+		self._tex_equation: 'str|None' = None
+
+	def formula(self) -> str:
+		return self._formula
+
+	def tokens(self) -> list[str]:
+		return self._tokens
+
+	def has_dependency(self) -> bool:
+		return self._has_dependency
+
+	def names(self) -> list[str]:
+		self._compile_dependencies()
+		return self._names
+
+	def addresses(self) -> 'list[sp.Address|sp.AddressRange]':
+		self._compile_dependencies()
+		return self._addresses
+
+	def placeholders(self) -> dict[str, str]:
+		"""
+			Возвращает подстановки в `tex_equation` для ссылок из `names()`: \
+			`{name: "#i"}` в том же порядке.
+		"""
+		self._compile_dependencies()
+		return self._placeholders
+
+	def tex_equation(self) -> str:
+		"""
+			Возвращает формулу, в которой ссылки заменены на подстановки \
+			(см. `placeholders()`), а знаки умножения - на `\\cdot`.
+		"""
+		if self._tex_equation is None:
+			formula_text = self._formula
+			for name, placeholder in self.placeholders().items():
+				formula_text = formula_text.replace(name, placeholder)
+			self._tex_equation = re.sub(re_star, " \\\\cdot ", formula_text)
+		return self._tex_equation
+
+	def _compile_dependencies(self) -> None:
+		if self._names is not None:
+			return
+
+		names: list[str] = []
+		addresses: list['sp.Address|sp.AddressRange'] = []
+		indices: dict['sp.Address|sp.AddressRange', int] = {}
+
+		for name in self._tokens:
+			# Cell or range name
+			if name.startswith("["):
+				full_name = ("[" + self._self_sheet + name[1:] if name.startswith("[.") else name)[1:-1].replace("$", "")
+				try:
+					addr = sp.parse_address(full_name)
+				except Exception as e:
+					# остается в формуле как есть (например, диапазоны на весь столбец или на несколько листов)
+					print(f"Warning: the cell with formula '{self._formula}' depends on '{name}', which cannot be dealt with: {str(e)}")
+					continue
+
+			# NamedExpression name
+			elif self._ss.has_named_expression(name):
+				addr = self._ss.get_named_expression(name).address()
+
+			# Other name
+			else:
+				continue
+
+			if not addr in indices:
+				indices[addr] = len(addresses)
+				addresses.append(addr)
+				names.append(name)
+
+		self._names = names
+		self._addresses = addresses
+		self._placeholders = {name: "#" + str(i + 1) for i, name in enumerate(names)}
+
+
+class LRUCache():
+	"""
+		Кэш, который при превышении `max_size` значений вытесняет значения, \
+		которые дольше всего не запрашивались (`max_size == -1` - без \
+		ограничения). Считает попадания и промахи.
+	"""
+	def __init__(self, name: str, max_size: int = -1) -> None:
+		self._name: str = name
+		self._max_size: int = max_size
+		self._data: collections.OrderedDict = collections.OrderedDict()
+		self._hits: int = 0
+		self._misses: int = 0
+
+	def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+		if not key in self._data:
+			self._misses += 1
+			return default
+		self._hits += 1
+		self._data.move_to_end(key)
+		return self._data[key]
+
+	def set(self, key: typing.Hashable, value: typing.Any) -> None:
+		self._data[key] = value
+		self._data.move_to_end(key)
+		if 0 <= self._max_size < len(self._data):
+			self._data.popitem(last=False)
+
+	def invalidate(self, key: typing.Hashable) -> None:
+		self._data.pop(key, None)
+
+	def keys(self) -> list[typing.Hashable]:
+		return list(self._data.keys())
+
+	def clear(self) -> None:
+		self._data.clear()
+
+	def __len__(self) -> int:
+		return len(self._data)
+
+	def name(self) -> str:
+		return self._name
+
+	def max_size(self) -> int:
+		return self._max_size
+
+	def hits(self) -> int:
+		return self._hits
+
+	def misses(self) -> int:
+		return self._misses
+
+	def get_stats_text(self) -> str:
+		max_size = "unlimited" if self._max_size < 0 else str(self._max_size)
+		return f"{self._name}: {len(self)}/{max_size} entries, {self._hits} hits, {self._misses} misses"
+
+
+class DependencyGraph():
+	"""
+		Граф зависимостей расчетных величин (`CalcObject`): для величины \
+		(по `CalcObject.address()`) - адреса величин из её формулы в порядке \
+		появления, с раскрытыми диапазонами (см. \
+		`CalcObjectsFactory.iterate_dependencies()`).
+
+		Зависимости величины вычисляются один раз, при первом обращении, \
+		чтобы величины создавались в том же порядке, что и при обходе \
+		без графа.
+
+		Для поиска циклов отмечаются "открытые" величины - те, которые ждут \
+		вычисления своих зависимостей (`open()`, `close()`). Зависимость \
+		от открытой величины или от самой себя (ссылка на свою строку, \
+		в том числе через диапазон) - цикл: о ней выводится предупреждение, \
+		и она убирается из зависимостей величины.
+	"""
+	def __init__(self, cof: 'CalcObjectsFactory') -> None:
+		self._cof: CalcObjectsFactory = cof
+		self._dependencies: dict[sp.Address, list[sp.Address]] = {}
+		self._open: set[sp.Address] = set()
+		# отброшенные циклические зависимости величин
+		self._circular: dict[sp.Address, set[sp.Address]] = {}
+
+	def dependencies(self, co: CalcObject) -> list[sp.Address]:
+		addr = co.address()
+		dependencies = self._dependencies.get(addr)
+		if dependencies is None:
+			compiled = self._cof.compile_formula(co.formula(), addr.sheet())
+			dependencies = list(self._cof.iterate_dependencies(compiled.addresses()))
+			self._dependencies[addr] = dependencies
+
+		row = addr.copy(column=0)
+		circular = [d for d in dependencies if d in self._open or d.copy(column=0) == row]
+		if len(circular) > 0:
+			for d in circular:
+				self._cof.print_warning(f"Warning: {addr}: circular dependency on {d}")
+			self._circular.setdefault(addr, set()).update(circular)
+			dependencies = [d for d in dependencies if not d in self._circular[addr]]
+			self._dependencies[addr] = dependencies
+		return dependencies
+
+	def is_circular(self, addr: sp.Address, dependency: sp.Address) -> bool:
+		"""
+			Была ли зависимость `dependency` величины `addr` отброшена \
+			как циклическая (см. `dependencies()`).
+		"""
+		return dependency in self._circular.get(addr, ())
+
+	def open(self, addr: sp.Address) -> None:
+		self._open.add(addr)
+
+	def close(self, addr: sp.Address) -> None:
+		self._open.discard(addr)
 
 
 class CalcObjectsFactory():
-	def __init__(self, ss: sp.Spreadsheet) -> None:
+	def __init__(self, ss: sp.Spreadsheet, cache_max_size: 'int|None' = None) -> None:
+		"""
+			`cache_max_size` - размер кэша `CalcObject` (по-умолчанию - \
+			`CALC_OBJECTS_CACHE_MAX_SIZE`).
+		"""
 		super().__init__()
 		self._ss: sp.Spreadsheet = ss
 		self._warnings: dict[str, int] = {}
 
+		self._calc_objects_cache: LRUCache = LRUCache(
+			"CalcObjects",
+			CALC_OBJECTS_CACHE_MAX_SIZE if cache_max_size is None else cache_max_size,
+		)
+
+		# индексы заголовков по `(sheet, headers_row)`: таблица, её версия
+		# и номера столбцов по названиям (см. `get_header_index()`)
+		self._header_indices: LRUCache = LRUCache("header indices", HEADER_INDICES_CACHE_MAX_SIZE)
+
+		# разобранные формулы по `(formula, sheet)` (см. `compile_formula()`)
+		self._formulas_cache: LRUCache = LRUCache("formulas", FORMULAS_CACHE_MAX_SIZE)
+
+		# Перенаправления (`is_redirect`) меняют `CalcObject`, на который
+		# ссылаются. Чтобы величина, вытесненная из кэша и созданная заново,
+		# была такой же, запоминаются адреса таких величин с `do_not_print`
+		# последнего перенаправления на них и адреса самих перенаправлений.
+		self._redirect_targets: dict[sp.Address, bool] = {}
+		self._redirect_sources: set[sp.Address] = set()
+
+		# Конечные адреса цепочек перенаправлений для каждого адреса цепочки
+		# (см. `_resolve_redirect()`) и адреса, замыкающие циклы перенаправлений.
+		self._redirects_resolved: dict[sp.Address, sp.Address] = {}
+		self._redirect_cycles: set[sp.Address] = set()
+
 		self._virtual_table = self._ss.ensure_table(sp.Spreadsheet.VIRTUAL_SHEET_NAME)
 		self.init_virtual_table()
 
 		co_PI = CalcObject(sp.Address.empty())
-		co_PI._is_known = True
+		co_PI._set_flag(CalcObject.IS_KNOWN, True)
 		co_PI._description = "число Пи"
 		co_PI._texput = "\\pi"
 		co_PI._value = math.pi
 		co_PI._text = str(co_PI._value)
-		co_PI._digits_count = -2
+		co_PI._set_digits_count(-2)
 		co_PI._value_type = "float"
 		addr_PI = self.set_virtual_CO(co_PI)
 		ne_PI = sp.NamedExpression("PI()", addr_PI)
 		self._ss.set_named_expression(ne_PI)
 
 		co_E = CalcObject(sp.Address.empty())
-		co_E._is_known = True
+		co_E._set_flag(CalcObject.IS_KNOWN, True)
 		co_E._description = "число Эйлера"
 		co_E._texput = "e"
 		co_E._value = math.e
 		co_E._text = str(co_E._value)
-		co_E._digits_count = -2
+		co_E._set_digits_count(-2)
 		co_E._value_type = "float"
 		addr_E = self.set_virtual_CO(co_E)
 		ne_E = sp.NamedExpression("EXP(1)", addr_E)
 		self._ss.set_named_expression(ne_E)
 
 	def get_calc_object(self, addr: sp.Address) -> 'CalcObject':
-		return self._get_calc_object(addr)
-	@functools.cache
-	def _get_calc_object(self, addr: sp.Address) -> 'CalcObject':
-		def get_cell(c: str):
-			return self._ss.get_cell(addr.copy(column=self.get_column_number(addr, c)))
+		co = self._calc_objects_cache.get(addr)
+		if co is None:
+			co = self._get_redirected_calc_object(addr)
+			if co is None:
+				co = self._get_calc_object(addr, addr in self._redirect_cycles)
+			self._cache_calc_object(addr, co)
+		return co
 
-		force_constant = False
+	def _cache_calc_object(self, addr: sp.Address, co: 'CalcObject') -> None:
+		if co.address() in self._redirect_targets:
+			co._set_flag(CalcObject.IS_REDIRECT, True)
+			co._set_flag(CalcObject.DO_NOT_PRINT, self._redirect_targets[co.address()])
+		self._calc_objects_cache.set(addr, co)
 
-		co = CalcObject(addr)
+	def caches(self) -> list[LRUCache]:
+		return [self._calc_objects_cache, self._header_indices, self._formulas_cache]
 
-		do_not_print = get_cell(Headers.do_not_print).text()
-		co._do_not_print = do_not_print != ""
+	def invalidate_caches(self, addr: 'sp.Address|None' = None) -> None:
+		"""
+			Удаляет из кэша `CalcObject` по адресу `addr` или, если `addr` \
+			не задан, очищает все кэши.
+		"""
+		if addr is None:
+			for cache in self.caches():
+				cache.clear()
+			self._redirect_targets.clear()
+			self._redirect_sources.clear()
+			self._redirects_resolved.clear()
+			self._redirect_cycles.clear()
+		else:
+			self._calc_objects_cache.invalidate(addr)
+			if addr in self._redirects_resolved or addr in self._redirects_resolved.values():
+				self._redirects_resolved.clear()
+				self._redirect_cycles.clear()
 
-		c_data = get_cell(Headers.data)
-		formula = c_data.formula()
+	def replace_tables(self, ss: sp.Spreadsheet, rows: list[sp.Address]) -> bool:
+		"""
+			Заменяет листы таблицы листами из `ss`, которые отличаются от них \
+			только ячейками строк `rows` (см. `spreadsheet_parser.diff_spreadsheets()`), \
+			и удаляет из кэша величины этих строк.
 
-		is_redirect: bool = get_cell(Headers.is_redirect).text() != ""
-		if is_redirect:
-			dependent: list[sp.Address] = self.get_dependent_addresses_in_order(formula, addr.sheet())[1]
-			if len(dependent) != 1:
-				self.print_warning(f"Warning: {co.address()}: bad redirect")
-			else:
-				addr_redirect = dependent[0]
+			Возвращает `False` и ничего не меняет, если среди строк `rows` есть \
+			строка заголовков или перенаправления (`is_redirect`) и величины, \
+			на которые они перенаправляют, в старых или новых листах.
+		"""
+		changed: set[tuple[str, int]] = set((a.sheet(), a.row()) for a in rows)
+		if len(changed) == 0:
+			return True
+
+		redirected: set[tuple[str, int]] = set(
+			(a.sheet(), a.row()) for a in [
+				*self._redirect_targets,
+				*self._redirect_sources,
+				*self._redirects_resolved,
+				*self._redirects_resolved.values(),
+			]
+		)
+		if any(a.row() == 0 or (a.sheet(), a.row()) in redirected for a in rows):
+			return False
+
+		# строки заголовков не изменились, поэтому номера столбцов те же
+		for a in rows:
+			column = self.get_header_index(a.sheet()).get(Headers.is_redirect, -1)
+			if self._ss.get_table(a.sheet()).get_cell(a.row(), column).text() != "" \
+					or ss.get_table(a.sheet()).get_cell(a.row(), column).text() != "":
+				return False
+
+		for sheet in set(a.sheet() for a in rows):
+			self._ss.set_table(ss.get_table(sheet))
+		for key in self._calc_objects_cache.keys():
+			if (key.sheet(), key.row()) in changed:
+				self._calc_objects_cache.invalidate(key)
+		return True
+
+	def _get_redirect(self, addr: sp.Address) -> 'sp.Address|None':
+		"""
+			Возвращает адрес, на который перенаправляет величина `addr` \
+			(`is_redirect`), или `None`, если это не перенаправление.
+		"""
+		table = self._ss.get_table(addr.sheet())
+		headers = self.get_header_index(addr.sheet())
+		if table.get_cell(addr.row(), headers.get(Headers.is_redirect, -1)).text() == "":
+			return None
+
+		formula = table.get_cell(addr.row(), headers.get(Headers.data, -1)).formula()
+		dependent: list['sp.Address|sp.AddressRange'] = self.get_dependent_addresses_in_order(formula, addr.sheet())[1]
+		if len(dependent) != 1 or isinstance(dependent[0], sp.AddressRange):
+			self.print_warning(f"Warning: {addr}: bad redirect")
+			return None
+		return dependent[0]
+
+	def _resolve_redirect(self, addr: sp.Address) -> tuple[sp.Address, list[sp.Address]]:
+		"""
+			Возвращает адрес величины, на которую через цепочку перенаправлений \
+			ссылается `addr` (или сам `addr`, если это не перенаправление), \
+			и пройденные адреса цепочки.
+
+			Цепочка проходится без рекурсии; конечный адрес запоминается для \
+			каждого адреса цепочки. Если цепочка замыкается в цикл, выводится \
+			предупреждение, а цепочка заканчивается на адресе, замыкающем цикл: \
+			величина по нему считается константой (см. `get_calc_object()`).
+		"""
+		chain: list[sp.Address] = []
+		visited: set[sp.Address] = set()
+		end = addr
+		while True:
+			resolved = self._redirects_resolved.get(end)
+			if resolved is not None:
+				end = resolved
+				break
+			if end in visited:
+				cycle = chain[chain.index(end):] + [end]
+				self.print_warning(f"Warning: {end}: recursive redirect: {' -> '.join(str(a) for a in cycle)}")
+				self._redirect_cycles.add(end)
+				self._redirects_resolved[end] = end
+				break
+			redirect = self._get_redirect(end)
+			if redirect is None:
+				break
+			chain.append(end)
+			visited.add(end)
+			end = redirect
+
+		chain = [a for a in chain if a != end]
+		for a in chain:
+			self._redirects_resolved[a] = end
+		return (end, chain)
+
+	def _get_redirected_calc_object(self, addr: sp.Address) -> 'CalcObject|None':
+		"""
+			Возвращает `CalcObject`, на который перенаправляет `addr`, или \
+			`None`, если `addr` не перенаправление.
+		"""
+		end, chain = self._resolve_redirect(addr)
+		if end == addr:
+			return None
+
+		# `do_not_print` берется из самого дальнего от величины перенаправления
+		# цепочки, которое встретилось впервые
+		for a in reversed(chain):
+			if not a in self._redirect_sources:
+				self._redirect_sources.add(a)
+				self._redirect_targets[end] = self._get_do_not_print(a)
+
+		try:
+			co = self.get_calc_object(end)
+		except Exception as e:
+			self.print_warning(f"Error: {addr}: {e.__class__.__name__}: {str(e)}")
+			return CalcObject(addr)
+		co._set_flag(CalcObject.IS_REDIRECT, True)
+		co._set_flag(CalcObject.DO_NOT_PRINT, self._redirect_targets[end])  # preserve do_not_print state as in original CO
+		return co
 
-				try:
-					co = self.get_calc_object(addr_redirect)
-					co._is_redirect = True
-					co._do_not_print = do_not_print != ""  # preserve do_not_print state as in original CO
-					return co
-				except RecursionError:
-					self.print_warning(f"Warning: {co.address()}: recursive redirect")
-					co._is_redirect = False
-					force_constant = True
-				except Exception as e:
-					self.print_warning(f"Error: {co.address()}: {e.__class__.__name__}: {str(e)}")
-					return CalcObject(addr)
+	def _get_do_not_print(self, addr: sp.Address) -> bool:
+		table = self._ss.get_table(addr.sheet())
+		headers = self.get_header_index(addr.sheet())
+		return table.get_cell(addr.row(), headers.get(Headers.do_not_print, -1)).text() != ""
+
+	def _get_calc_object(self, addr: sp.Address, force_constant: bool = False) -> 'CalcObject':
+		table = self._ss.get_table(addr.sheet())
+		headers = self.get_header_index(addr.sheet())
+
+		def get_cell(c: str) -> sp.Cell:
+			return table.get_cell(addr.row(), headers.get(c, -1))
+
+		return self._make_calc_object(addr, get_cell, Headers.source_name in headers, force_constant)
+
+	def _make_calc_object(
+			self,
+			addr: sp.Address,
+			get_cell: 'typing.Callable[[str], sp.Cell]',
+			has_source_name: bool,
+			force_constant: bool = False,
+			) -> 'CalcObject':
+		"""
+			Создает `CalcObject` по адресу `addr` из ячеек его строки, \
+			которые возвращает `get_cell` по названию столбца (см. `Headers`).
+		"""
+		co = CalcObject(addr)
 
+		do_not_print = get_cell(Headers.do_not_print).text()
+		co._set_flag(CalcObject.DO_NOT_PRINT, do_not_print != "")
 
+		c_data = get_cell(Headers.data)
+		formula = c_data.formula()
 
 		text = c_data.text()
 		texput = get_cell(Headers.texput).text()
@@ -246,8 +693,8 @@ class CalcObjectsFactory():
 
 		co._description = description
 
-		co._is_known = is_known != ""
-		co._is_constant = force_constant or is_constant != "" or formula == "" or not self.has_any_dependency(formula)
+		co._set_flag(CalcObject.IS_KNOWN, is_known != "")
+		co._set_flag(CalcObject.IS_CONSTANT, force_constant or is_constant != "" or formula == "" or not self.has_any_dependency(formula, addr.sheet()))
 
 		if texput != "":
 			co._texput = texput
@@ -259,22 +706,24 @@ class CalcObjectsFactory():
 
 		co._unit_texput = unit_texput
 
-		co._tex_equation = tex_equation if tex_equation != "" \
-			else self.ensure_tex_equation(formula, addr.sheet())
-
-		co._digits_count = str_utils.safe_int(digits_count, -1)
-		co._subst_units = str_utils.safe_int(subst_units, -1)
+		co._set_digits_count(str_utils.safe_int(digits_count, -1))
+		co._set_subst_units(str_utils.safe_int(subst_units, -1))
 
-		if self.get_column_number(addr, Headers.source_name) != -1:
-			co._source_name = source_name
-			co._source_aux = source_aux
-		else:
+		if not has_source_name:
 			_i = source.find(",")
 			if _i != -1:
-				co._source_name = source[:_i].strip()
-				co._source_aux = source[_i + 1:].strip()
+				source_name = source[:_i].strip()
+				source_aux = source[_i + 1:].strip()
 			else:
-				co._source_name = source.strip()
+				source_name = source.strip()
+				source_aux = ""
+
+		if tex_equation != "":
+			co._set_rare(source_name, source_aux, tex_equation)
+		elif formula != "":
+			co._set_rare(source_name, source_aux, None)  # по формуле при первом обращении
+		else:
+			co._set_rare(source_name, source_aux, "")
 		return co
 
 	def get_column_number(self, addr: sp.Address, column_header_name: str, headers_row: int = 0) -> int:
@@ -283,74 +732,143 @@ class CalcObjectsFactory():
 			со строкой `headers_row` (нумерация с `0`) в ячейке \
 			содержится текст `column_header_name`.
 		"""
-		return self._get_column_number(addr, column_header_name, headers_row)
-	@functools.cache
-	def _get_column_number(self, addr: sp.Address, column_header_name: str, headers_row: int = 0) -> int:
-		table: sp.Table = self._ss.get_table(addr.sheet())
-		for i in range(table.get_column_count()):
-			if table.get_cell(headers_row, i).text() == column_header_name:
-				return i
-		return -1
-
-	def get_dependent_addresses_in_order(self, formula_text: str, self_sheet: str) -> 'tuple[list[str], list[sp.Address]]':
-		names: list[str] = []
-		addresses: list[sp.Address] = []
+		return self.get_header_index(addr.sheet(), headers_row).get(column_header_name, -1)
 
-		for name in re_dependent_name.findall(formula_text):
-			# Cell name
-			if name.startswith("["):
-				if ":" in name:
-					print(f"Warning: the cell with formula '{formula_text}' depends on range '{name}'. Cannot deal with ranges for now.")  # FIXME
-					continue
+	def get_header_index(self, sheet_name: str, headers_row: int = 0) -> dict[str, int]:
+		"""
+			Возвращает номера столбцов (нумерация с `0`) листа `sheet_name` \
+			по текстам их ячеек в строке `headers_row` (при повторах - первый \
+			столбец).
 
-				full_name = ("[" + self_sheet + name[1:] if name.startswith("[.") else name)[1:-1].replace("$", "")
-				addr = sp.Address.from_text(full_name)
-				if not addr in addresses:
-					addresses.append(addr)
-					names.append(name)
+			Строится один раз и перестраивается, только если лист изменился.
+		"""
+		table: sp.BaseTable = self._ss.get_table(sheet_name)
+		key = (sheet_name, headers_row)
+		entry = self._header_indices.get(key)
+		if entry is not None and entry[0] is table and entry[1] == table.version():
+			return entry[2]
+
+		index: dict[str, int] = {}
+		for i, cell in enumerate(table.get_block(headers_row, 0, 1, table.get_column_count())[0]):
+			index.setdefault(cell.text(), i)
+		self._header_indices.set(key, (table, table.version(), index))
+		return index
+
+	def compile_formula(self, formula_text: str, self_sheet: str) -> 'CompiledFormula':
+		"""
+			Возвращает разобранную формулу `formula_text` ячейки с листа \
+			`self_sheet` (из кэша, если она уже разбиралась).
+		"""
+		key = (formula_text, self_sheet)
+		compiled = self._formulas_cache.get(key)
+		if compiled is None:
+			compiled = CompiledFormula(formula_text, self_sheet, self._ss)
+			self._formulas_cache.set(key, compiled)
+		return compiled
+
+	def get_dependent_addresses_in_order(self, formula_text: str, self_sheet: str) -> 'tuple[list[str], list[sp.Address|sp.AddressRange]]':
+		"""
+			Возвращает ссылки на ячейки, диапазоны и именованные выражения \
+			в формуле `formula_text` в порядке появления (без повторов) \
+			и их адреса (см. `CompiledFormula`). Списки не следует изменять.
 
-			# NamedExpression name
-			elif self._ss.has_named_expression(name):
-				addr = self._ss.get_named_expression(name).address()
-				if not addr in addresses:
-					addresses.append(addr)
-					names.append(name)
+			Диапазоны не раскрываются (см. `iterate_dependencies()`).
+		"""
+		compiled = self.compile_formula(formula_text, self_sheet)
+		return compiled.names(), compiled.addresses()
 
-			# Other name
+	def iterate_dependencies(self, addresses: 'typing.Iterable[sp.Address|sp.AddressRange]') -> typing.Iterator[sp.Address]:
+		"""
+			Итерирует адреса из `addresses`, раскрывая диапазоны в адреса \
+			их величин, по одной на строку (см. `iterate_range()`).
+		"""
+		for addr in addresses:
+			if isinstance(addr, sp.AddressRange):
+				yield from self.iterate_range(addr)
 			else:
-				pass
-
-		return names, addresses
+				yield addr
 
-	def has_any_dependency(self, formula_text: str) -> bool:
-		for m in re_dependent_name.finditer(formula_text):
-			name: str = m.group(0)
-			if name.startswith("[") or self._ss.has_named_expression(name):
-				return True
-			else:
-				pass
-		return False
+	def iterate_range(self, addr_range: sp.AddressRange, block_rows: int = 256) -> typing.Iterator[sp.Address]:
+		"""
+			Итерирует величины диапазона `addr_range`: для каждой строки \
+			(кроме строки заголовков) - адрес первой ячейки диапазона \
+			с числовым значением (`sp.NUMERIC_VALUE_TYPES`), по одному на строку. \
+			Строки без чисел в диапазоне величинами не считаются и пропускаются.
+
+			Ячейки читаются блоками по `block_rows` строк и только в пределах \
+			размеров листа, так что диапазоны на весь столбец не раскрываются \
+			целиком.
+		"""
+		table = self._ss.get_table(addr_range.sheet())
+		start = addr_range.start()
+		start_row = max(start.row(), 1)
+		end_row = min(addr_range.end().row() + 1, table.get_row_count())
+		column_count = min(addr_range.end().column() + 1, table.get_column_count()) - start.column()
+		if column_count <= 0:
+			return
+
+		for row in range(start_row, end_row, block_rows):
+			block = table.get_block(row, start.column(), min(block_rows, end_row - row), column_count)
+			for i, cells in enumerate(block):
+				for j, cell in enumerate(cells):
+					if cell.value_type() in sp.NUMERIC_VALUE_TYPES:
+						yield sp.Address(addr_range.sheet(), row + i, start.column() + j)
+						break
+
+	def has_any_dependency(self, formula_text: str, self_sheet: str = "") -> bool:
+		return self.compile_formula(formula_text, self_sheet).has_dependency()
 
 	def ensure_tex_equation(self, formula_text: str, self_sheet: str) -> str:
-		names: list[str] = self.get_dependent_addresses_in_order(formula_text, self_sheet)[0]
-
-		for i, name in enumerate(names):
-			formula_text = formula_text.replace(name, "#" + str(i + 1))
-
-		formula_text = re.sub(re_star, " \\\\cdot ", formula_text)
-
-		return formula_text
+		return self.compile_formula(formula_text, self_sheet).tex_equation()
 
 	def iterate_calc_objects(self, sheet_name: str) -> typing.Iterator[CalcObject]:
 		sheet = self._ss.get_table(sheet_name)
 		if sheet.is_empty():
 			raise Exception(f"Bad sheet name: \"{sheet_name}\"")
 
-		for i in range(1, sheet.get_row_count()):
-			co = self.get_calc_object(sp.Address(sheet_name, i, 0))
+		for co in self.iterate_sheet(sheet_name):
 			if not co.is_empty():
 				yield co
 
+	def iterate_sheet(self, sheet_name: str, block_rows: int = 256) -> typing.Iterator[CalcObject]:
+		"""
+			Итерирует `CalcObject` всех строк листа `sheet_name` после строки \
+			заголовков, в том числе пустые; то же, что `get_calc_object()` \
+			для каждой строки.
+
+			Ячейки столбцов `Headers` читаются блоками по `block_rows` строк \
+			(см. `sp.BaseTable.get_block()`), а не по одной на каждое поле каждой строки. \
+			Перенаправления (`is_redirect`) создаются через `get_calc_object()`.
+		"""
+		table = self._ss.get_table(sheet_name)
+		headers = self.get_header_index(sheet_name)
+		has_source_name = Headers.source_name in headers
+
+		columns: dict[str, int] = {h: headers[h] for h in Headers_str if h in headers}
+		first_column = min(columns.values(), default=0)
+		column_count = max(columns.values(), default=-1) - first_column + 1
+		indices: dict[str, int] = {h: j - first_column for h, j in columns.items()}
+		i_redirect: int = indices.get(Headers.is_redirect, -1)
+		empty_cell = sp.Cell()
+
+		row_count = table.get_row_count()
+		for row in range(1, row_count, block_rows):
+			block = table.get_block(row, first_column, min(block_rows, row_count - row), column_count)
+			for i, cells in enumerate(block):
+				addr = sp.Address(sheet_name, row + i, 0)
+				co = self._calc_objects_cache.get(addr)
+				if co is None:
+					if i_redirect != -1 and cells[i_redirect].text() != "":
+						co = self.get_calc_object(addr)
+					else:
+						def get_cell(c: str) -> sp.Cell:
+							j = indices.get(c, -1)
+							return cells[j] if j != -1 else empty_cell
+
+						co = self._make_calc_object(addr, get_cell, has_source_name)
+						self._cache_calc_object(addr, co)
+				yield co
+
 	def print_warning(self, msg: str) -> None:
 		if not msg in self._warnings:
 			self._warnings[msg] = 0
@@ -379,7 +897,7 @@ class CalcObjectsFactory():
 		_set_cell(Headers.description, co.description())
 		_set_cell(Headers.texput, co.texput())
 		_set_cell(Headers.unit_texput, co.unit_texput())
-		_set_cell(Headers.tex_equation, co.tex_equation())
+		_set_cell(Headers.tex_equation, co.tex_equation(self))
 		_set_cell(Headers.is_known, co.is_known())
 		_set_cell(Headers.is_constant, co.is_constant())
 		_set_cell(Headers.do_not_print, co.do_not_print())
@@ -396,3 +914,51 @@ class CalcObjectsFactory():
 		self._virtual_table.set_cell(i, j, c_data)
 
 		return addr
+
+
+if __name__ == "__main__":
+	# Замер памяти под `CalcObject` всех строк листа и времени их создания:
+	#     python calc_object.py [<rows>]
+	import sys
+	import time
+	import tracemalloc
+
+	n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+	ss = sp.Spreadsheet()
+	t = ss.create_table("bench")
+
+	def put(row: int, column: int, text: str, value: float = 0, formula: str = "", value_type: str = "string") -> None:
+		c = sp.Cell()
+		c.init(value, formula, text, value_type)
+		t.set_cell(row, column, c)
+
+	for j, header in enumerate([Headers.description, Headers.texput, Headers.unit_texput, Headers.data, Headers.source]):
+		put(0, j, header)
+	for i in range(1, n_rows + 1):
+		put(i, 0, f"Величина {i}")
+		put(i, 1, f"x_{{{i}}}")
+		put(i, 2, "м")
+		if i % 2 == 1:
+			put(i, 3, "1.5", 1.5, "", "float")
+			if i % 10 == 1:
+				put(i, 4, f"[{i}], с. {i}")
+		else:
+			put(i, 3, "3", 3, f"[.D{i - 1}]*2", "float")
+
+	tracemalloc.start()
+	calc_objects = list(CalcObjectsFactory(ss, -1).iterate_calc_objects("bench"))
+	size = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	print(f"{len(calc_objects)} CalcObjects: {size / (1 << 20):.1f} MiB with caches, {size // len(calc_objects)} bytes per CalcObject")
+	del calc_objects
+
+	# время - отдельно, так как `tracemalloc` замедляет создание объектов
+	t0 = time.perf_counter()
+	cof = CalcObjectsFactory(ss, -1)
+	for i in range(1, t.get_row_count()):
+		cof.get_calc_object(sp.Address("bench", i, 0))
+	t1 = time.perf_counter()
+	list(CalcObjectsFactory(ss, -1).iterate_calc_objects("bench"))
+	t2 = time.perf_counter()
+	print(f"get_calc_object() for each row: {t1 - t0:.2f} s, iterate_calc_objects(): {t2 - t1:.2f} s")
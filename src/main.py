@@ -1,10 +1,15 @@
 import sys
+import typing
 import arguments_parser
 
+import os
 import zipfile
+import mmap
 
 import xml_parser
 import spreadsheet_parser
+import spreadsheet_cache
+import str_utils
 import calc_object
 import tex_constructor
 import file_watcher
@@ -23,7 +28,8 @@ arguments_parser.ARGUMENTS_HELP_MESSAGE = """\
 
 Аргументы:
     <ods-file>
-        Путь к ODS-файлу.
+        Путь к ODS-файлу или к FODS-файлу (Flat ODS, таблица в виде одного
+        XML-файла).
 
     <sheet-name>
         Название листа (sheet) в ODS-файле.
@@ -40,11 +46,69 @@ arguments_parser.ARGUMENTS_HELP_MESSAGE = """\
         Следить за изменениями ODS-файла и перезапускать программу в случае
         обновления файла.
 
+        Если в файле изменились только значения и тексты ячеек (но не формулы,
+        признаки величин, заполненность ячеек, заголовки, листы), в tex-файле
+        заново выводятся только фрагменты с величинами из изменившихся строк.
+
     --disable_units_in_equations
         Отключить подстановку единиц измерения при подстановке чисел в формулы.
         Единицы измерения всё равно будут подставляться в формулу, если для неё
         принудительно задано subst_units == 1.
 
+    --all_sheets
+        Читать все листы ODS-файла. По-умолчанию читаются только листы
+        <sheet-name> и листы, на которые они ссылаются в формулах.
+
+    --cache_dir <dir>
+        Каталог для кэша прочитанных таблиц. Если содержимое ODS-файла (и набор
+        листов) не изменилось, таблица читается из кэша без разбора XML.
+
+        По-умолчанию кэш не используется.
+
+    --cache_max_size <MiB>
+        Максимальный размер кэша в мегабайтах. При превышении удаляются файлы,
+        которые дольше всего не использовались.
+
+        По-умолчанию - 64.
+
+    --columnar_tables
+        Хранить ячейки листов в компактном виде (массивами), а не объектами.
+        Экономит память на больших листах.
+
+    -j <N>
+    --jobs <N>
+        Читать листы параллельно в N процессах.
+
+        По-умолчанию - 1 (без параллельного чтения).
+
+    --co_cache_size <N>
+        Максимальное число величин (CalcObject) в кэше. При превышении из кэша
+        удаляются величины, которые дольше всего не использовались, и при
+        следующем обращении читаются заново. -1 - без ограничения.
+
+        По-умолчанию - 65536.
+
+    --cache_stats
+        Вывести статистику кэшей (размер, число попаданий и промахов) после
+        конвертации.
+
+    --export <dir>
+        Записать прочитанные листы в каталог <dir>, каждый в отдельный файл
+        '<dir>/<название листа>.tsv' (или '.csv'), - например, для обработки
+        другими программами.
+
+    --export_format <format>
+        Формат файлов для '--export': 'tsv' (значения через табуляцию) или
+        'csv' (значения через запятую).
+
+        По-умолчанию - 'tsv'.
+
+    --xml_parser <name>
+        Парсер XML: 'expat' (быстрый, на C, из стандартной библиотеки Python)
+        или 'python' (медленный, на чистом Python).
+
+        По-умолчанию - 'expat'.
+
 
 Разработчик: Никита Мамай (nikita@mamay.su).
 Екатеринбург, 2023 год."""
@@ -57,73 +121,166 @@ tex_filename: str = "data_calc.tex"
 
 
 ### parsing arguments
+# (only when run as a script: worker processes of '--jobs' import this module too)
 
 class OPTIONS:
     TEX_FILENAME = "tex_filename"
     WATCH_CHANGES = "watch_changes"
     DISABLE_UNITS_IN_EQUATIONS = "disable_units_in_equations"
+    XML_PARSER = "xml_parser"
+    ALL_SHEETS = "all_sheets"
+    CACHE_DIR = "cache_dir"
+    CACHE_MAX_SIZE = "cache_max_size"
+    JOBS = "jobs"
+    COLUMNAR_TABLES = "columnar_tables"
+    CO_CACHE_SIZE = "co_cache_size"
+    CACHE_STATS = "cache_stats"
+    EXPORT_DIR = "export_dir"
+    EXPORT_FORMAT = "export_format"
 
 
-args_positional, options = arguments_parser.ArgumentsParser() \
-    .set_min_max_count(2, -1) \
-    .add_option_with_one_local_arg(["-t", "--tex"], OPTIONS.TEX_FILENAME) \
-    .add_option_boolean(["-w", "--watch"], OPTIONS.WATCH_CHANGES, True) \
-    .add_option_boolean(["--disable_units_in_equations"], OPTIONS.DISABLE_UNITS_IN_EQUATIONS) \
-    .parse(sys.argv[1:])
+if __name__ == "__main__":
+    args_positional, options = arguments_parser.ArgumentsParser() \
+        .set_min_max_count(2, -1) \
+        .add_option_with_one_local_arg(["-t", "--tex"], OPTIONS.TEX_FILENAME) \
+        .add_option_boolean(["-w", "--watch"], OPTIONS.WATCH_CHANGES, True) \
+        .add_option_boolean(["--disable_units_in_equations"], OPTIONS.DISABLE_UNITS_IN_EQUATIONS) \
+        .add_option_with_one_local_arg(["--xml_parser"], OPTIONS.XML_PARSER) \
+        .add_option_boolean(["--all_sheets"], OPTIONS.ALL_SHEETS) \
+        .add_option_with_one_local_arg(["--cache_dir"], OPTIONS.CACHE_DIR) \
+        .add_option_with_one_local_arg(["--cache_max_size"], OPTIONS.CACHE_MAX_SIZE) \
+        .add_option_with_one_local_arg(["-j", "--jobs"], OPTIONS.JOBS) \
+        .add_option_boolean(["--columnar_tables"], OPTIONS.COLUMNAR_TABLES) \
+        .add_option_with_one_local_arg(["--co_cache_size"], OPTIONS.CO_CACHE_SIZE) \
+        .add_option_boolean(["--cache_stats"], OPTIONS.CACHE_STATS) \
+        .add_option_with_one_local_arg(["--export"], OPTIONS.EXPORT_DIR) \
+        .add_option_with_one_local_arg(["--export_format"], OPTIONS.EXPORT_FORMAT) \
+        .parse(sys.argv[1:])
 
 
 
-use_tex_filename: bool = OPTIONS.TEX_FILENAME in options
-if use_tex_filename:
-    tex_filename = options[OPTIONS.TEX_FILENAME]
+    use_tex_filename: bool = OPTIONS.TEX_FILENAME in options
+    if use_tex_filename:
+        tex_filename = options[OPTIONS.TEX_FILENAME]
 
-do_watch_for_changes: bool = OPTIONS.WATCH_CHANGES in options
-do_disable_units_in_equations: bool = OPTIONS.DISABLE_UNITS_IN_EQUATIONS in options
+    do_watch_for_changes: bool = OPTIONS.WATCH_CHANGES in options
+    do_disable_units_in_equations: bool = OPTIONS.DISABLE_UNITS_IN_EQUATIONS in options
+    do_load_all_sheets: bool = OPTIONS.ALL_SHEETS in options
+    jobs: int = max(1, str_utils.safe_int(options.get(OPTIONS.JOBS, ""), 1))
 
+    if OPTIONS.COLUMNAR_TABLES in options:
+        spreadsheet_parser.TABLE_CLASS = spreadsheet_parser.ColumnarTable
 
-ods_filename: str = args_positional[0]
-sheet_names: str = args_positional[1:]
+    xml_parser_name: str = options.get(OPTIONS.XML_PARSER, xml_parser.DEFAULT_XML_PARSER)
+    if not xml_parser_name in xml_parser.XML_PARSERS:
+        arguments_parser.show_error_and_exit(f"Unknown XML parser: {repr(xml_parser_name)}")
 
+    cache: 'spreadsheet_cache.SpreadsheetCache|None' = None
+    if OPTIONS.CACHE_DIR in options:
+        cache_max_size: int = str_utils.safe_int(options.get(OPTIONS.CACHE_MAX_SIZE, ""), -1)
+        if cache_max_size < 0:
+            cache_max_size = spreadsheet_cache.CACHE_DEFAULT_MAX_SIZE >> 20
+        cache = spreadsheet_cache.SpreadsheetCache(options[OPTIONS.CACHE_DIR], cache_max_size << 20)
 
-def do_action():
-    ### loading the ods file
 
-    with zipfile.ZipFile(ods_filename, "r") as file:
-        b = file.read("content.xml")
-        text = str(b, encoding="utf-8")
+    calc_object.CALC_OBJECTS_CACHE_MAX_SIZE = str_utils.safe_int(
+        options.get(OPTIONS.CO_CACHE_SIZE, ""), calc_object.CALC_OBJECTS_CACHE_MAX_SIZE)
+    do_print_cache_stats: bool = OPTIONS.CACHE_STATS in options
+
+    export_dir: 'str|None' = options.get(OPTIONS.EXPORT_DIR, None)
+    export_format: str = options.get(OPTIONS.EXPORT_FORMAT, "tsv")
+    if not export_format in spreadsheet_parser.EXPORT_FORMATS:
+        arguments_parser.show_error_and_exit(f"Unknown export format: {repr(export_format)}")
 
-    ### parsing XML
 
-    xml = xml_parser.parse_xml(text)
+    ods_filename: str = args_positional[0]
+    sheet_names: str = args_positional[1:]
 
+    is_flat_ods: bool = ods_filename.lower().endswith(".fods")
 
-    ### parsing Spreadsheet
 
-    ss: spreadsheet_parser.Spreadsheet = spreadsheet_parser.parse_spreadsheet(xml)
+def load_spreadsheet(open_xml: 'typing.Callable[[], typing.BinaryIO]') -> spreadsheet_parser.Spreadsheet:
+    sheets_to_load = None if do_load_all_sheets else sheet_names
+
+    if cache is None:
+        return spreadsheet_parser.load_spreadsheet(open_xml, sheets_to_load, xml_parser_name, jobs)
+
+    ss, is_cached = cache.load_spreadsheet(open_xml, sheets_to_load, xml_parser_name, jobs)
+    if is_cached:
+        print(f"Loaded from cache '{cache.directory()}'")
+    return ss
+
+
+def export_tables(ss: spreadsheet_parser.Spreadsheet) -> None:
+    os.makedirs(export_dir, exist_ok=True)
+    for t in ss.tables():
+        filename = os.path.join(export_dir, t.name().replace("/", "_").replace("\\", "_") + "." + export_format)
+        with open(filename, "w", encoding="utf-8", newline="") as file:
+            t.export(file, export_format)
+        print(f"Exported '{t.name()}' in '{filename}'")
+
+
+# the Document of the previous conversion, which is updated by the changed cells in the watch mode
+previous_doc: 'tex_constructor.Document|None' = None
+
+
+def do_action():
+    global previous_doc
+
+    ### loading the ods file, streaming the XML into the XML and Spreadsheet parsers
+
+    if is_flat_ods:
+        # the whole file is XML; it is memory-mapped and read by chunks, without a copy in memory
+        with open(ods_filename, "rb") as file:
+            ss = load_spreadsheet(lambda: mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+    else:
+        with zipfile.ZipFile(ods_filename, "r") as file:
+            ss = load_spreadsheet(lambda: file.open("content.xml"))
 
     # printing read tables sizes
     for t in ss.tables():
         print(t.name(), ":", t.get_row_count(), "x", t.get_column_count())
     print()
 
-    doc = tex_constructor.Document(ss)
-    doc.cfg_use_units_in_equations = not do_disable_units_in_equations
+    if export_dir is not None:
+        export_tables(ss)
+        print()
+
+    ### updating TeX of the previous conversion only by the changed cells
+
+    doc = previous_doc
+    updated: 'int|None' = None if doc is None else doc.update(ss)
+    if updated is not None:
+        print(f"Updated {updated} TeX fragments")
 
+    else:
+        doc = tex_constructor.Document(ss)
+        doc.cfg_use_units_in_equations = not do_disable_units_in_equations
 
-    ### listing CalcObjects in the target sheet, which specified in argv
-    co_to_use: list[spreadsheet_parser.Address] = []
-    for sheet_name in sheet_names:
-        co_to_use.extend([
-            co.address() for co in \
-                filter(lambda co: not co.do_not_print(), doc._COF.iterate_calc_objects(sheet_name))
-        ])
 
+        ### listing CalcObjects in the target sheet, which specified in argv
+        co_to_use: list[spreadsheet_parser.Address] = []
+        for sheet_name in sheet_names:
+            co_to_use.extend([
+                co.address() for co in \
+                    filter(lambda co: not co.do_not_print(), doc._COF.iterate_calc_objects(sheet_name))
+            ])
 
-    ### constructing TeX
 
-    doc.process(co_to_use)
+        ### constructing TeX
+
+        doc.process(co_to_use)
+
+    if do_watch_for_changes:
+        previous_doc = doc
+
     text = doc.string_fixed_percent()
 
+    if do_print_cache_stats:
+        print()
+        for c in doc._COF.caches():
+            print(c.get_stats_text())
+
 
     ### writing result in TeX-file
 
@@ -135,27 +292,28 @@ def do_action():
 
 ### starting loop
 
-# timestamp of entry's last update
-# 0 means that the actions will execute immediately when program is started.
-last_updated: int = 0
+if __name__ == "__main__":
+    # timestamp of entry's last update
+    # 0 means that the actions will execute immediately when program is started.
+    last_updated: int = 0
 
-while True:
-    try:
-        last_updated_new = file_watcher.check_entry_for_updates(ods_filename, last_updated)
+    while True:
+        try:
+            last_updated_new = file_watcher.check_entry_for_updates(ods_filename, last_updated)
 
-        if last_updated_new > last_updated:
-            do_action()
+            if last_updated_new > last_updated:
+                do_action()
 
-            if not do_watch_for_changes:
-                exit(0)
+                if not do_watch_for_changes:
+                    exit(0)
 
-            last_updated = time.time_ns()
-            print("=" * 30, end="\n\n")
+                last_updated = time.time_ns()
+                print("=" * 30, end="\n\n")
 
-        time.sleep(1)
+            time.sleep(1)
 
-    except KeyboardInterrupt:
-        exit(0)
+        except KeyboardInterrupt:
+            exit(0)
 
-    except Exception as e:
-        raise e
+        except Exception as e:
+            raise e
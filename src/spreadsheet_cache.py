@@ -0,0 +1,243 @@
+import typing
+import os
+import hashlib
+import marshal
+import struct
+import zlib
+
+import spreadsheet_parser as sp
+import xml_parser
+
+
+# Сигнатура файлов кэша
+CACHE_MAGIC: bytes = b"ODS2LATEX-SS"
+
+# Версия формата файлов кэша. Файлы другой версии считаются отсутствующими.
+CACHE_FORMAT_VERSION: int = 3
+
+# Расширение файлов кэша
+CACHE_FILE_EXTENSION: str = ".ss"
+
+# Размер кэша по-умолчанию (в байтах), после превышения которого удаляются
+# давно не использованные файлы
+CACHE_DEFAULT_MAX_SIZE: int = 64 << 20
+
+_header = struct.Struct(f"<{len(CACHE_MAGIC)}sI")
+
+
+def get_key(
+		open_xml: 'typing.Callable[[], typing.BinaryIO]',
+		sheet_names: 'typing.Iterable[str]|None' = None,
+		chunk_size: int = xml_parser.XML_STREAM_CHUNK_SIZE,
+		) -> str:
+	"""
+		Возвращает ключ кэша: SHA-256 от содержимого XML (`content.xml`), поток \
+		с которым открывает `open_xml`, и от набора листов `sheet_names` \
+		(см. `spreadsheet_parser.load_spreadsheet()`).
+	"""
+	h = hashlib.sha256()
+	with open_xml() as stream:
+		while True:
+			b = stream.read(chunk_size)
+			if len(b) == 0:
+				break
+			h.update(b)
+
+	h.update(b"\0")
+	if sheet_names is None:
+		h.update(b"\0*")
+	else:
+		for name in sorted(set(sheet_names)):
+			h.update(b"\0" + name.encode("utf-8"))
+	return h.hexdigest()
+
+
+def dump_spreadsheet(ss: sp.Spreadsheet) -> bytes:
+	"""
+		Возвращает `Spreadsheet` (листы, ячейки и именованные выражения) \
+		в сжатом двоичном виде.
+
+		Повторенные ячейки и строки записываются один раз вместе с числом \
+		повторений, одинаковые ячейки - тоже один раз.
+	"""
+	tables = []
+	for t in ss.tables():
+		cells: list[tuple[float, str, str, str]] = []
+		cells_indices: dict[tuple, int] = {}
+		positions: list[int] = []
+		for row, column, row_span, column_span, cell in t.iterate_runs():
+			c = (cell.value(), cell.value_type(), cell.formula(), cell.text())
+			key = (c[0].__class__, *c)  # чтобы не смешивать 0 и 0.0
+			if not key in cells_indices:
+				cells_indices[key] = len(cells)
+				cells.append(c)
+			positions.extend((row, column, row_span, column_span, cells_indices[key]))
+		tables.append((t.name(), cells, positions))
+
+	named_exprs = []
+	for ne in ss.named_expressions():
+		addr = ne.address()
+		start, end = (addr.start(), addr.end()) if isinstance(addr, sp.AddressRange) else (addr, None)
+		named_exprs.append((
+			ne.name(),
+			start.sheet(),
+			start.row(),
+			start.column(),
+			None if end is None else (end.row(), end.column()),
+		))
+
+	data = zlib.compress(marshal.dumps((tables, named_exprs)))
+	return _header.pack(CACHE_MAGIC, CACHE_FORMAT_VERSION) + data
+
+
+def load_spreadsheet(data: bytes) -> 'sp.Spreadsheet|None':
+	"""
+		Восстанавливает `Spreadsheet` из результата `dump_spreadsheet()`.
+
+		Возвращает `None`, если данные другого формата или версии.
+	"""
+	if len(data) < _header.size:
+		return None
+	magic, version = _header.unpack_from(data)
+	if magic != CACHE_MAGIC or version != CACHE_FORMAT_VERSION:
+		return None
+
+	tables, named_exprs = marshal.loads(zlib.decompress(data[_header.size:]))
+
+	ss = sp.Spreadsheet()
+	for name, cells_data, positions in tables:
+		t = ss.create_table(name)
+		cells: list[sp.Cell] = []
+		for value, value_type, formula, text in cells_data:
+			cell = sp.Cell()
+			cell.init(value, formula, text, value_type)
+			cells.append(cell)
+		row_spans: dict[int, int] = {}
+		for i in range(0, len(positions), 5):
+			row, column, row_span, column_span, cell_i = positions[i:i + 5]
+			t.set_cell(row, column, cells[cell_i], column_span)
+			if row_span > 1:
+				row_spans[row] = row_span
+		for row, row_span in row_spans.items():
+			t.set_row_span(row, row_span)
+
+	for name, sheet, row, column, end in named_exprs:
+		addr = sp.Address(sheet, row, column)
+		if end is not None:
+			addr = sp.AddressRange(addr, sp.Address(sheet, *end))
+		ss.set_named_expression(sp.NamedExpression(name, addr))
+
+	return ss
+
+
+class SpreadsheetCache():
+	"""
+		Кэш прочитанных `Spreadsheet` в каталоге `directory` на диске.
+
+		Каждый `Spreadsheet` хранится в отдельном файле, имя которого - ключ \
+		(см. `get_key()`). Когда суммарный размер файлов превышает `max_size` \
+		байт, удаляются файлы, которые дольше всего не использовались.
+	"""
+	def __init__(self, directory: str, max_size: int = CACHE_DEFAULT_MAX_SIZE) -> None:
+		self._directory: str = directory
+		self._max_size: int = max_size
+
+	def directory(self) -> str:
+		return self._directory
+
+	def get_path(self, key: str) -> str:
+		return os.path.join(self._directory, key + CACHE_FILE_EXTENSION)
+
+	def load(self, key: str) -> 'sp.Spreadsheet|None':
+		"""
+			Возвращает `Spreadsheet` из кэша или `None`, если его там нет.
+		"""
+		path = self.get_path(key)
+		try:
+			with open(path, "rb") as file:
+				data = file.read()
+			ss = load_spreadsheet(data)
+		except FileNotFoundError:
+			return None
+		except Exception as e:
+			print(f"Warning: bad cache file '{path}': {e.__class__.__name__}: {str(e)}")
+			ss = None
+
+		if ss is None:
+			self._remove(path)
+			return None
+
+		os.utime(path)  # отметка об использовании для вытеснения
+		return ss
+
+	def save(self, key: str, ss: sp.Spreadsheet) -> None:
+		"""
+			Записывает `Spreadsheet` в кэш и вытесняет старые файлы, если кэш \
+			стал больше `max_size`.
+		"""
+		os.makedirs(self._directory, exist_ok=True)
+		path = self.get_path(key)
+		path_tmp = path + ".tmp"
+		with open(path_tmp, "wb") as file:
+			file.write(dump_spreadsheet(ss))
+		os.replace(path_tmp, path)
+
+		self.evict(keep=path)
+
+	def load_spreadsheet(
+			self,
+			open_xml: 'typing.Callable[[], typing.BinaryIO]',
+			sheet_names: 'typing.Iterable[str]|None' = None,
+			parser_name: str = xml_parser.DEFAULT_XML_PARSER,
+			jobs: int = 1,
+			) -> tuple[sp.Spreadsheet, bool]:
+		"""
+			То же, что `spreadsheet_parser.load_spreadsheet()`, но сначала ищет \
+			`Spreadsheet` в кэше, а прочитанный сохраняет в кэш.
+
+			Возвращает `Spreadsheet` и `True`, если он взят из кэша.
+		"""
+		if sheet_names is not None:
+			sheet_names = list(sheet_names)
+
+		key = get_key(open_xml, sheet_names)
+		ss = self.load(key)
+		if ss is not None:
+			return (ss, True)
+
+		ss = sp.load_spreadsheet(open_xml, sheet_names, parser_name, jobs)
+		self.save(key, ss)
+		return (ss, False)
+
+	def evict(self, keep: str = "") -> None:
+		"""
+			Удаляет давно не использованные файлы кэша, пока их суммарный размер \
+			больше `max_size`. Файл `keep` не удаляется.
+		"""
+		entries: list[tuple[int, int, str]] = []
+		total_size = 0
+		for f in os.listdir(self._directory):
+			if not f.endswith(CACHE_FILE_EXTENSION):
+				continue
+			path = os.path.join(self._directory, f)
+			try:
+				s = os.stat(path)
+			except FileNotFoundError:
+				continue
+			entries.append((s.st_mtime_ns, s.st_size, path))
+			total_size += s.st_size
+
+		entries.sort()
+		for _, size, path in entries:
+			if total_size <= self._max_size:
+				break
+			if path == keep:
+				continue
+			self._remove(path)
+			total_size -= size
+
+	def _remove(self, path: str) -> None:
+		try:
+			os.remove(path)
+		except FileNotFoundError:
+			pass
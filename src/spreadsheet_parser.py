@@ -1,5 +1,15 @@
 import typing
+import abc
 import functools  # for @cache on functions
+import concurrent.futures
+import io
+import mmap
+import array
+import bisect
+import weakref
+import csv
+
+from html import unescape as html_unescape
 
 import xml_parser
 import re
@@ -31,6 +41,220 @@ def parse_spreadsheet(nodes: list[xml_parser.Node]) -> 'Spreadsheet':
 	return spreadsheet
 
 
+# Тэги, которые не нужны для чтения `Spreadsheet` (из `content.xml` или FODS-файла)
+# и пропускаются `load_spreadsheet()`
+SKIPPED_TAGS: set[str] = {
+	"office:meta",
+	"office:settings",
+	"office:scripts",
+	"office:font-face-decls",
+	"office:styles",
+	"office:automatic-styles",
+	"office:master-styles",
+}
+
+# RegExp на ссылку на ячейку или диапазон в формуле: `[.A1]`, `[$Sheet.$A$1:.B2]`
+re_formula_reference = re.compile(r'\[([^\]]+)\]')
+
+# RegExp на имя в формуле, которое может быть именованным выражением
+re_formula_name = re.compile(r'\b(?!\d)\w+\b')
+
+# RegExp на адрес ячейки без знаков `$`: `Sheet.AB12`
+re_address = re.compile(r'([^.]*)\.([A-Za-z]*)(\d+)')
+
+# RegExp на адрес диапазона без знаков `$`: `Sheet.A1:.B12`, `Sheet.A1:Sheet.B12`
+re_address_range = re.compile(r'([^.:]*)\.([A-Za-z]*)(\d+):([^.:]*)\.([A-Za-z]*)(\d+)')
+
+
+def load_spreadsheet(
+		open_xml: 'typing.Callable[[], typing.BinaryIO]',
+		sheet_names: 'typing.Iterable[str]|None' = None,
+		parser_name: str = xml_parser.DEFAULT_XML_PARSER,
+		jobs: int = 1,
+		) -> 'Spreadsheet':
+	"""
+		Читает `Spreadsheet` из XML (`content.xml`), поток с которым открывает \
+		`open_xml`.
+
+		Если задан `sheet_names`, полностью читаются только листы с этими именами \
+		и листы, на которые они ссылаются в формулах (напрямую или через \
+		именованные выражения), рекурсивно. Остальные `table:table`, а также \
+		стили (`SKIPPED_TAGS`), пропускаются без создания `Node`. Если листы \
+		ссылаются на ещё не прочитанные листы, XML читается повторно - только \
+		ради них.
+
+		Если `sheet_names` равен `None`, читаются все листы.
+
+		Если `jobs` больше 1, листы читаются параллельно (см. \
+		`load_spreadsheet_parallel()`).
+	"""
+	if jobs > 1:
+		with open_xml() as stream:
+			# `mmap` (FODS-файл) разбирается без копирования в память
+			data = stream if isinstance(stream, mmap.mmap) else stream.read()
+			return load_spreadsheet_parallel(data, sheet_names, parser_name, jobs)
+
+	spreadsheet = Spreadsheet()
+
+	to_load: 'set[str]|None' = None if sheet_names is None else set(sheet_names)
+	loaded: set[str] = set()
+
+	def skip(node: xml_parser.NodeTag) -> bool:
+		if node.name == "table:table":
+			return to_load is not None and not node.get_option("table:name", "") in to_load
+		return node.name in SKIPPED_TAGS
+
+	while to_load is None or len(to_load) > 0:
+		with open_xml() as stream:
+			nodes = xml_parser.parse_xml_stream(stream, parser_name, skip=skip)
+		ss = parse_spreadsheet(nodes)
+
+		for t in ss.tables():
+			if to_load is None or t.name() in to_load:
+				spreadsheet.set_table(t)
+		for ne in ss.named_expressions():
+			spreadsheet.set_named_expression(ne)
+
+		if to_load is None:
+			break
+
+		referenced: set[str] = set()
+		for name in to_load:
+			if spreadsheet.has_table(name):
+				referenced |= _get_referenced_sheets(spreadsheet.get_table(name), spreadsheet)
+
+		loaded |= to_load
+		to_load = referenced - loaded
+
+	return spreadsheet
+
+
+def load_spreadsheet_parallel(
+		data: 'bytes|mmap.mmap',
+		sheet_names: 'typing.Iterable[str]|None' = None,
+		parser_name: str = xml_parser.DEFAULT_XML_PARSER,
+		jobs: int = 2,
+		) -> 'Spreadsheet':
+	"""
+		Читает `Spreadsheet` из XML (`content.xml`) `data`, разбирая каждый лист \
+		в отдельном процессе (не более `jobs` процессов одновременно).
+
+		Границы `table:table` находятся быстрым поиском по байтам \
+		(`find_table_ranges()`). Остальной XML (без листов и `SKIPPED_TAGS`) \
+		с именованными выражениями разбирается в текущем процессе.
+
+		`sheet_names` - как в `load_spreadsheet()`.
+	"""
+	spreadsheet = Spreadsheet()
+
+	ranges = find_table_ranges(data)
+
+	rest: list[bytes] = []
+	pos = 0
+	for _, start, end in ranges:
+		rest.append(bytes(data[pos:start]))
+		pos = end
+	rest.append(bytes(data[pos:]))
+
+	nodes = xml_parser.parse_xml_stream(
+		io.BytesIO(b"".join(rest)), parser_name,
+		skip=lambda node: node.name in SKIPPED_TAGS)
+	for ne in parse_spreadsheet(nodes).named_expressions():
+		spreadsheet.set_named_expression(ne)
+
+	to_load: set[str] = set(name for name, _, _ in ranges) if sheet_names is None else set(sheet_names)
+	loaded: set[str] = set()
+
+	with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+		while len(to_load) > 0:
+			tasks = [
+				(bytes(data[start:end]), parser_name, TABLE_CLASS)
+					for name, start, end in ranges if name in to_load
+			]
+			for t in pool.map(_parse_table_xml, tasks):
+				spreadsheet.set_table(t)
+
+			referenced: set[str] = set()
+			for name in to_load:
+				if spreadsheet.has_table(name):
+					referenced |= _get_referenced_sheets(spreadsheet.get_table(name), spreadsheet)
+
+			loaded |= to_load
+			to_load = referenced - loaded
+
+	return spreadsheet
+
+
+# RegExp на открывающий или закрывающий тэг `table:table` в байтах XML
+re_table_tag = re.compile(rb'<(/?)table:table(?=[\s/>])([^>]*)>')
+
+# RegExp на имя листа в опциях тэга `table:table`
+re_table_name = re.compile(rb'table:name\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+
+def find_table_ranges(data: 'bytes|mmap.mmap') -> list[tuple[str, int, int]]:
+	"""
+		Находит в байтах XML `data` листы `table:table` верхнего уровня, не \
+		разбирая XML.
+
+		Возвращает `list` из имени листа, позиции начала открывающего тэга \
+		и позиции после закрывающего тэга.
+	"""
+	result: list[tuple[str, int, int]] = []
+
+	depth = 0
+	name = ""
+	start = 0
+	for m in re_table_tag.finditer(data):
+		if m.group(1) == b"/":
+			depth -= 1
+			if depth == 0:
+				result.append((name, start, m.end()))
+		elif not m.group(2).endswith(b"/"):
+			if depth == 0:
+				m_name = re_table_name.search(m.group(2))
+				name = "" if m_name is None else \
+					html_unescape(str(m_name.group(1) if m_name.group(2) is None else m_name.group(2), encoding="utf-8"))
+				start = m.start()
+			depth += 1
+
+	return result
+
+
+def _parse_table_xml(task: 'tuple[bytes, str, type[BaseTable]]') -> 'BaseTable':
+	"""
+		Разбирает XML одного `table:table` парсером с именем `parser_name` \
+		в таблицу класса `table_class`. Выполняется в процессе \
+		из `load_spreadsheet_parallel()`.
+	"""
+	xml, parser_name, table_class = task
+	nodes = xml_parser.parse_xml_stream(io.BytesIO(xml), parser_name)
+	return _parse_table(next(xml_parser.iterate_tags(nodes)), table_class)
+
+
+def _get_referenced_sheets(table: 'BaseTable', spreadsheet: 'Spreadsheet') -> set[str]:
+	"""
+		Возвращает имена листов, на которые ссылаются формулы в `table` \
+		(без самого `table`).
+	"""
+	result: set[str] = set()
+
+	formulas: set[str] = set(cell.formula() for *_, cell in table.iterate_runs())
+	for formula in formulas:
+		for m in re_formula_reference.finditer(formula):
+			for part in m.group(1).split(":"):
+				if "." in part:
+					sheet = part.split(".", 1)[0].replace("$", "").strip("'")
+					if sheet != "":
+						result.add(sheet)
+		for name in re_formula_name.findall(formula):
+			if spreadsheet.has_named_expression(name):
+				result.add(spreadsheet.get_named_expression(name).address().sheet())
+
+	result.discard(table.name())
+	return result
+
+
 class Address():
 	"""
 		Адрес ячейки (`Cell`) в таблице (`Spreadsheet`) по стандарту ODS (Open \
@@ -42,32 +266,45 @@ class Address():
 		Нумерация строк и столбцов в реализации класса - с нуля 0. \
 		При возврате текстового представления адреса через `get_text()` \
 		(и `__str__()`) нумерация строк (`row`) - с единицы 1.
+
+		Неизменяемый. Одинаковые используемые адреса - один и тот же объект \
+		(см. `_interned`), хэш вычисляется один раз при создании.
 	"""
-	def __init__(self, sheet: str, row: int, column: int) -> None:
-		super().__init__()
-		self._sheet: str = sheet
-		self._row: int = row
-		self._column: int = column
+	__slots__ = ("_sheet", "_row", "_column", "_hash", "__weakref__")
 
-	@staticmethod
-	def from_text(address_text: str) -> 'Address':
-		if not "." in address_text:
-			raise Exception(f"Bad address: {repr(address_text)}")
+	# Используемые адреса по `(sheet, row, column)`; адрес, на который
+	# больше нет ссылок, удаляется
+	_interned: 'weakref.WeakValueDictionary[tuple[str, int, int], Address]' = weakref.WeakValueDictionary()
 
-		address_text = address_text.replace("$", "")
-		sheet, cell = address_text.split(".", 1)
-		i = 0
-		while i < len(cell):
-			if cell[i].isnumeric():
-				break
-			i += 1
-		column_name = cell[:i]
-		row_name = cell[i:]
+	def __new__(cls, sheet: str, row: int, column: int) -> 'Address':
+		key = (sheet, row, column)
+		self = cls._interned.get(key)
+		if self is None:
+			self = super().__new__(cls)
+			object.__setattr__(self, "_sheet", sheet)
+			object.__setattr__(self, "_row", row)
+			object.__setattr__(self, "_column", column)
+			object.__setattr__(self, "_hash", hash(key))
+			cls._interned[key] = self
+		return self
+
+	def __setattr__(self, name: str, value: typing.Any) -> None:
+		raise AttributeError(f"{self.__class__.__name__} is immutable")
 
-		column = Address.get_column_number(column_name)
-		row = int(row_name) - 1
+	def __delattr__(self, name: str) -> None:
+		raise AttributeError(f"{self.__class__.__name__} is immutable")
 
-		return Address(sheet, row, column)
+	def __reduce__(self):  # для pickle и copy
+		return (Address, (self._sheet, self._row, self._column))
+
+	@staticmethod
+	@functools.lru_cache(maxsize=4096)
+	def from_text(address_text: str) -> 'Address':
+		m = re_address.fullmatch(address_text.replace("$", ""))
+		if m is None:
+			raise Exception(f"Bad address: {repr(address_text)}")
+		sheet, column_name, row_name = m.groups()
+		return Address(sheet, int(row_name) - 1, Address.get_column_number(column_name))
 
 	@staticmethod
 	def empty() -> 'Address':
@@ -92,7 +329,7 @@ class Address():
 
 	def copy(self, sheet: 'str|None' = None, row: 'int|None' = None, column: 'int|None' = None):
 		"""
-			Возвращает новый объект `Address` - копию `self` с изменениями или без таковых.
+			Возвращает `Address` - копию `self` с изменениями или без таковых.
 
 			Переданные аргументы меняют соответствующие свойства возвращаемого объекта.
 		"""
@@ -102,14 +339,19 @@ class Address():
 			self.column() if column is None else column,
 		)
 
-	def __hash__(self) -> int:  # для @functools.cache
-		return self.__str__().__hash__()
+	def __hash__(self) -> int:
+		return self._hash
 
 	def __eq__(self, __value: object) -> bool:
+		if self is __value:
+			return True
 		if isinstance(__value, Address):
-			return self._sheet == __value._sheet \
+			return self._hash == __value._hash \
+				and self._sheet == __value._sheet \
 				and self._row == __value._row \
 				and self._column == __value._column
+		if isinstance(__value, AddressRange):
+			return False
 		raise Exception(f"Cannot compare {self.__class__} with {__value.__class__}")
 
 	def get_row_address(self) -> 'Address':
@@ -138,19 +380,120 @@ class Address():
 		return f'<Address {self.get_text()}>'
 
 
+class AddressRange():
+	"""
+		Адрес прямоугольного диапазона ячеек на одном листе, например, \
+		`Sheet.A1:.B12`: от ячейки `start()` до ячейки `end()` включительно.
+
+		Неизменяемый, как и `Address`.
+	"""
+	__slots__ = ("_start", "_end", "_hash")
+
+	def __init__(self, start: Address, end: Address) -> None:
+		if start.sheet() != end.sheet():
+			raise Exception(f"Ranges over several sheets are not supported: {start}:{end}")
+		object.__setattr__(self, "_start", Address(
+			start.sheet(), min(start.row(), end.row()), min(start.column(), end.column())))
+		object.__setattr__(self, "_end", Address(
+			start.sheet(), max(start.row(), end.row()), max(start.column(), end.column())))
+		object.__setattr__(self, "_hash", hash((self._start, self._end)))
+
+	def __setattr__(self, name: str, value: typing.Any) -> None:
+		raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+	def __delattr__(self, name: str) -> None:
+		raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+	def __reduce__(self):  # для pickle и copy
+		return (AddressRange, (self._start, self._end))
+
+	@staticmethod
+	@functools.lru_cache(maxsize=1024)
+	def from_text(range_text: str) -> 'AddressRange':
+		"""
+			Читает диапазон вида `Sheet.A1:.B12`. Если лист после `:` не указан, \
+			он тот же, что и до `:`.
+		"""
+		m = re_address_range.fullmatch(range_text.replace("$", ""))
+		if m is None:
+			raise Exception(f"Bad address range: {repr(range_text)}")
+		sheet, column_name, row_name, end_sheet, end_column_name, end_row_name = m.groups()
+		return AddressRange(
+			Address(sheet, int(row_name) - 1, Address.get_column_number(column_name)),
+			Address(sheet if end_sheet == "" else end_sheet, int(end_row_name) - 1, Address.get_column_number(end_column_name)),
+		)
+
+	def __hash__(self) -> int:
+		return self._hash
+
+	def __eq__(self, __value: object) -> bool:
+		if isinstance(__value, AddressRange):
+			return self._start is __value._start and self._end is __value._end
+		if isinstance(__value, Address):
+			return False
+		raise Exception(f"Cannot compare {self.__class__} with {__value.__class__}")
+
+	def __contains__(self, addr: Address) -> bool:
+		return addr.sheet() == self.sheet() \
+			and self._start.row() <= addr.row() <= self._end.row() \
+			and self._start.column() <= addr.column() <= self._end.column()
+
+	def iterate_addresses(self) -> typing.Iterator[Address]:
+		"""
+			Итерирует адреса ячеек диапазона по строкам.
+		"""
+		for row in range(self._start.row(), self._end.row() + 1):
+			for column in range(self._start.column(), self._end.column() + 1):
+				yield Address(self.sheet(), row, column)
+
+	def get_text(self) -> str:
+		return f'{self._start.get_text()}:.{Address.get_column_name(self._end.column())}{self._end.row() + 1}'
+
+	def start(self) -> Address:
+		return self._start
+
+	def end(self) -> Address:
+		return self._end
+
+	def sheet(self) -> str:
+		return self._start.sheet()
+
+	def row_count(self) -> int:
+		return self._end.row() - self._start.row() + 1
+
+	def column_count(self) -> int:
+		return self._end.column() - self._start.column() + 1
+
+	def __str__(self) -> str:
+		return self.get_text()
+
+	def __repr__(self) -> str:
+		return f'<AddressRange {self.get_text()}>'
+
+
+def parse_address(text: str) -> 'Address|AddressRange':
+	"""
+		Читает адрес ячейки (`Address`) или, если в `text` есть `:`, диапазона \
+		(`AddressRange`).
+	"""
+	if ":" in text:
+		return AddressRange.from_text(text)
+	return Address.from_text(text)
+
+
 class NamedExpression():
 	"""
 		Именованное выражение, то есть альтернативное имя (`name`) для ячейки \
-		по адресу (`address`) в таблице ODS/LibreOffice Calc.
+		или диапазона ячеек по адресу (`address`) в таблице ODS/LibreOffice Calc.
 	"""
-	def __init__(self, name: str, address: Address) -> None:
+	def __init__(self, name: str, address: 'Address|AddressRange') -> None:
 		self._name: str = name
-		self._address: Address = address
+		self._address: 'Address|AddressRange' = address
 
 	def name(self) -> str:
 		return self._name
 
-	def address(self) -> Address:
+	def address(self) -> 'Address|AddressRange':
 		return self._address
 
 
@@ -189,75 +532,914 @@ class Cell():
 		return self._formula
 
 
-class Table():
+class BaseTable(abc.ABC):
 	"""
-		Таблица (точнее, Лист) в Spreadsheet.
+		Таблица (точнее, Лист) в Spreadsheet: общий интерфейс таблиц \
+		с разным хранением ячеек (`Table`, `ColumnarTable`).
+
+		Повторенные ячейки (`table:number-columns-repeated`) и строки \
+		(`table:number-rows-repeated`) хранятся один раз вместе с числом \
+		повторений. `get_cell()` находит их по любому номеру внутри повтора.
 	"""
 	def __init__(self) -> None:
 		self._name: str = ""
-		self._cells: dict[int, dict[int, Cell]] = {}
+
+		# размеры таблицы, обновляются при записи ячеек
+		self._row_count: int = 0
+		self._column_count: int = 1
+
+		self._version: int = 0
 
 	def name(self) -> str:
 		return self._name
 
-	def set_cell(self, row: int, column: int, cell: Cell) -> None:
-		if not row in self._cells:
-			self._cells[row] = {}
-		self._cells[row][column] = cell
+	def version(self) -> int:
+		"""
+			Возвращает номер версии таблицы, который увеличивается при каждом \
+			изменении ячеек. По нему проверяют, устарели ли данные, \
+			вычисленные по таблице.
+		"""
+		return self._version
 
-	# @functools.cache
+	@abc.abstractmethod
+	def set_cell(self, row: int, column: int, cell: Cell, column_span: int = 1) -> None:
+		"""
+			Записывает `cell` в строку `row` в столбцы с `column` по \
+			`column + column_span - 1`.
+
+			Если строка `row` - часть повторенной строки, повтор разбивается.
+		"""
+		pass
+
+	@abc.abstractmethod
+	def set_row_span(self, row: int, row_span: int) -> None:
+		"""
+			Повторяет строку `row` `row_span` раз, то есть строки с `row + 1` \
+			по `row + row_span - 1` становятся такими же, как `row`. \
+			Эти строки должны быть пустыми.
+
+			Пустая строка `row` так и остается пустой.
+		"""
+		pass
+
+	@abc.abstractmethod
 	def get_cell(self, row: int, column: int) -> 'Cell':
-		if row < 0 or not row in self._cells or column < 0 or not column in self._cells[row]:
-			return Cell()
-		return self._cells[row][column]
+		pass
+
+	@abc.abstractmethod
+	def get_block(self, row: int, column: int, row_count: int, column_count: int) -> list[list[Cell]]:
+		"""
+			Возвращает ячейки прямоугольного блока из `row_count` строк, \
+			начиная со строки `row`, и `column_count` столбцов, начиная \
+			со столбца `column`: список строк, каждая - список ячеек.
+
+			То же, что `get_cell()` для каждой ячейки блока, но быстрее.
+		"""
+		pass
+
+	@abc.abstractmethod
+	def iterate_runs(self) -> 'typing.Iterator[tuple[int, int, int, int, Cell]]':
+		"""
+			Итерирует непустые ячейки таблицы без раскрытия повторов: \
+			`(row, column, row_span, column_span, cell)`.
+		"""
+		pass
+
+	def iterate_cells(self) -> 'typing.Iterator[tuple[int, int, Cell]]':
+		"""
+			Итерирует непустые ячейки таблицы: `(row, column, cell)`.
+
+			Повторенные ячейки выдаются столько раз, сколько повторены.
+		"""
+		for row, column, row_span, column_span, cell in self.iterate_runs():
+			for i in range(row, row + row_span):
+				for j in range(column, column + column_span):
+					yield (i, j, cell)
 
 	def get_row_count(self) -> int:
-		if len(self._cells.keys()) == 0:
-			return 0
-		return max(self._cells.keys()) + 1
+		return self._row_count
 
 	def get_column_count(self) -> int:
-		result = 0
-		for row_i in self._cells:
-			result = max(result, *self._cells[row_i].keys())
-		return result + 1
+		"""
+			Возвращает номер последнего непустого столбца плюс 1 (у пустой \
+			таблицы - `1`).
+		"""
+		return self._column_count
 
 	def is_empty(self) -> bool:
 		return self.get_row_count() == 0
 
 	def to_tsv(self) -> str:
-		result = ""
+		result: list[str] = []
+		for row in self.iterate_blocks():
+			result.append("\t".join([repr(cell.text()) for cell in row]))
+			result.append("\n")
+		return "".join(result)
+
+	def iterate_blocks(self, block_rows: int = 256) -> 'typing.Iterator[list[Cell]]':
+		"""
+			Итерирует строки таблицы (списки ячеек от первого до последнего \
+			столбца), читая их блоками по `block_rows` строк (см. `get_block()`).
+		"""
 		rows = self.get_row_count()
-		cols = self.get_column_count()
-		for i in range(rows):
-			result += "\t".join([repr(self.get_cell(i, j).text()) for j in range(cols)])
-			result += "\n"
+		columns = self.get_column_count()
+		for row in range(0, rows, block_rows):
+			yield from self.get_block(row, 0, min(block_rows, rows - row), columns)
+
+	def export(self, file: typing.TextIO, export_format: str = "tsv") -> None:
+		"""
+			Записывает тексты ячеек таблицы в `file` построчно в формате \
+			`export_format` (см. `EXPORT_FORMATS`), не собирая весь текст \
+			в памяти.
+
+			Строки строятся из хранимых ячеек (см. `iterate_rows_texts()`) \
+			и заканчиваются на последней непустой ячейке; пустые строки \
+			записываются как один перевод строки.
+
+			`file` следует открывать с `newline=""`.
+		"""
+		if not export_format in EXPORT_FORMATS:
+			raise Exception(f"Unknown export format: {repr(export_format)}")
+		writer = csv.writer(file, EXPORT_FORMATS[export_format])
+
+		def write_empty_rows(count: int) -> None:
+			for i in range(0, count, 4096):
+				file.write(writer.dialect.lineterminator * min(4096, count - i))
+
+		next_row = 0
+		for row, row_span, texts in self.iterate_rows_texts():
+			write_empty_rows(row - next_row)
+			if len(texts) == 0:
+				write_empty_rows(row_span)
+			else:
+				for _ in range(row_span):
+					writer.writerow(texts)
+			next_row = row + row_span
+		write_empty_rows(self.get_row_count() - next_row)
+
+	@abc.abstractmethod
+	def iterate_rows_texts(self) -> 'typing.Iterator[tuple[int, int, list[str]]]':
+		"""
+			Итерирует хранимые строки таблицы по возрастанию номеров: \
+			`(row, row_span, texts)`, где `texts` - тексты ячеек строки \
+			от первого столбца до последней непустой ячейки (см. `_get_row_texts()`).
+		"""
+		pass
+
+	def to_numpy(self, columns: 'typing.Sequence[int]|None' = None) -> 'tuple[typing.Any, dict[str, typing.Any]]':
+		"""
+			Возвращает значения ячеек массивом NumPy (`float64`) размером \
+			`(get_row_count(), get_column_count())` или, если заданы `columns`, \
+			только из этих столбцов (в этом порядке), и маски ячеек по типам \
+			значений: `{value_type: массив bool того же размера}`.
+
+			Значения пустых ячеек и ячеек нечисловых типов (не из \
+			`NUMERIC_VALUE_TYPES`) - `NaN`.
+
+			Массивы строятся из хранимых ячеек и повторов, повторы раскрываются \
+			средствами NumPy. Без циклов на Python это делается только \
+			для `ColumnarTable`, которая хранит ячейки массивами; `Table` \
+			перебирает свои хранимые ячейки (`iterate_runs()`) один раз. \
+			Требует NumPy.
+		"""
+		np = _import_numpy()
+		rows, cols, row_spans, column_spans, values, types, value_types = self._get_numpy_runs(np)
+
+		# раскрытие повторов по столбцам, затем по строкам
+		idx = np.repeat(np.arange(len(cols)), column_spans)
+		cols = cols[idx] + _get_runs_offsets(np, column_spans)
+		rows, row_spans, values, types = rows[idx], row_spans[idx], values[idx], types[idx]
+
+		idx = np.repeat(np.arange(len(rows)), row_spans)
+		rows = rows[idx] + _get_runs_offsets(np, row_spans)
+		cols, values, types = cols[idx], values[idx], types[idx]
+
+		shape = (self.get_row_count(), self.get_column_count())
+		if columns is not None:
+			columns = np.asarray(columns, dtype=np.int64)
+			columns_map = np.full(max(shape[1], int(columns.max(initial=-1)) + 1), -1, dtype=np.int64)
+			columns_map[columns] = np.arange(len(columns))
+			cols = columns_map[cols]
+			is_selected = cols != -1
+			rows, cols, values, types = rows[is_selected], cols[is_selected], values[is_selected], types[is_selected]
+			shape = (shape[0], len(columns))
+
+		numeric_types = [i for i, vt in enumerate(value_types) if vt in NUMERIC_VALUE_TYPES]
+		is_numeric = np.isin(types, numeric_types)
+		result = np.full(shape, np.nan)
+		result[rows[is_numeric], cols[is_numeric]] = values[is_numeric]
+
+		masks: dict[str, typing.Any] = {}
+		for i, vt in enumerate(value_types):
+			is_type = types == i
+			if is_type.any():
+				mask = np.zeros(shape, dtype=bool)
+				mask[rows[is_type], cols[is_type]] = True
+				masks[vt] = mask
+
+		return (result, masks)
+
+	def _get_numpy_runs(self, np: typing.Any) -> tuple:
+		"""
+			Возвращает для `to_numpy()` массивы NumPy с номерами строк, столбцов, \
+			числами повторов по строкам и по столбцам, значениями и номерами \
+			типов значений хранимых ячеек, а также список типов значений.
+
+			Перебирает хранимые ячейки на Python (`ColumnarTable` берет массивы \
+			без перебора).
+		"""
+		value_types: list[str] = []
+		value_types_ids: dict[str, int] = {}
+		runs: list[list] = [[], [], [], [], [], []]
+		for row, column, row_span, column_span, cell in self.iterate_runs():
+			runs[0].append(row)
+			runs[1].append(column)
+			runs[2].append(row_span)
+			runs[3].append(column_span)
+			runs[4].append(cell.value())
+			runs[5].append(_get_pool_id(value_types, value_types_ids, cell.value_type()))
+		return (
+			*(np.array(a, dtype=np.int64) for a in runs[:4]),
+			np.array(runs[4], dtype=np.float64),
+			np.array(runs[5], dtype=np.int64),
+			value_types,
+		)
+
+
+class Table(BaseTable):
+	"""
+		Таблица (лист) в Spreadsheet (см. `BaseTable`) с ячейками в словарях \
+		по номерам строк и столбцов.
+
+		Повторенная ячейка хранится под номером первого столбца, повторенная \
+		строка - под номером первой строки.
+	"""
+	def __init__(self) -> None:
+		super().__init__()
+		self._cells: dict[int, dict[int, Cell]] = {}
+
+		# число повторений строк (> 1) по номеру первой строки и их номера по возрастанию
+		self._row_spans: dict[int, int] = {}
+		self._row_runs: list[int] = []
+
+		# то же для повторенных ячеек в строке (по номеру строки из `_cells`)
+		self._column_spans: dict[int, dict[int, int]] = {}
+		self._column_runs: dict[int, list[int]] = {}
+
+	def set_cell(self, row: int, column: int, cell: Cell, column_span: int = 1) -> None:
+		self._version += 1
+		if row >= self._row_count:
+			self._row_count = row + 1
+		if column + column_span > self._column_count:
+			self._column_count = column + column_span
+
+		if row in self._row_spans or not row in self._cells:
+			r = self._find_row_run(row)
+			if r != -1:
+				self._split_row(r, row)
+			else:
+				self._cells[row] = {}
+
+		if column_span == 1 and not row in self._column_runs:
+			self._cells[row][column] = cell
+			return
+
+		self._clear_columns(row, column, column + column_span)
+		self._cells[row][column] = cell
+		if column_span > 1:
+			if not row in self._column_runs:
+				self._column_spans[row] = {}
+				self._column_runs[row] = []
+			self._column_spans[row][column] = column_span
+			bisect.insort(self._column_runs[row], column)
+
+	def set_row_span(self, row: int, row_span: int) -> None:
+		if row_span <= 1:
+			return
+		r = self._find_row(row)
+		if r == -1:
+			return
+		self._split_row(r, row)
+
+		end = row + row_span
+		if row_span <= len(self._cells):
+			is_occupied = any(i in self._cells for i in range(row + 1, end))
+		else:
+			is_occupied = any(row < i < end for i in self._cells)
+		if is_occupied:
+			raise Exception(f"Cannot repeat row {row} {row_span} times in table '{self._name}': next rows are not empty")
+
+		self._row_spans[row] = row_span
+		bisect.insort(self._row_runs, row)
+		self._row_count = max(self._row_count, end)
+		self._version += 1
+
+	# @functools.cache
+	def get_cell(self, row: int, column: int) -> 'Cell':
+		cells = self._cells.get(row)
+		if cells is None:
+			row = self._find_row_run(row)
+			if row == -1:
+				return Cell()
+			cells = self._cells[row]
+
+		cell = cells.get(column)
+		if cell is None:
+			column = self._find_column_run(row, column)
+			if column == -1:
+				return Cell()
+			cell = cells[column]
+		return cell
+
+	def get_block(self, row: int, column: int, row_count: int, column_count: int) -> list[list[Cell]]:
+		result: list[list[Cell]] = []
+		last_row = -1
+		for i in range(row, row + row_count):
+			r = self._find_row(i)
+			if r != -1 and r == last_row:  # та же повторенная строка
+				result.append(list(result[-1]))
+				continue
+			last_row = r
+
+			cells = self._cells.get(r)
+			if cells is None:
+				result.append([Cell() for _ in range(column_count)])
+				continue
+
+			block_row: list[Cell] = []
+			has_runs = r in self._column_runs
+			for j in range(column, column + column_count):
+				cell = cells.get(j)
+				if cell is None and has_runs:
+					c = self._find_column_run(r, j)
+					if c != -1:
+						cell = cells[c]
+				block_row.append(Cell() if cell is None else cell)
+			result.append(block_row)
 		return result
 
+	def iterate_runs(self) -> 'typing.Iterator[tuple[int, int, int, int, Cell]]':
+		for row, cells in self._cells.items():
+			row_span = self._row_spans.get(row, 1)
+			column_spans = self._column_spans.get(row, {})
+			for column, cell in cells.items():
+				yield (row, column, row_span, column_spans.get(column, 1), cell)
+
+	def iterate_rows_texts(self) -> 'typing.Iterator[tuple[int, int, list[str]]]':
+		for row in sorted(self._cells):
+			column_spans = self._column_spans.get(row, {})
+			yield (
+				row,
+				self._row_spans.get(row, 1),
+				_get_row_texts((column, column_spans.get(column, 1), cell.text()) for column, cell in self._cells[row].items()),
+			)
+
+	def _find_row(self, row: int) -> int:
+		"""
+			Возвращает номер строки в `_cells`, которая (с повторами) включает \
+			строку `row`, или `-1`, если такой нет.
+		"""
+		if row in self._cells:
+			return row
+		return self._find_row_run(row)
+
+	def _find_row_run(self, row: int) -> int:
+		"""
+			Возвращает номер первой строки повтора, включающего строку `row`, \
+			или `-1`, если такого нет.
+		"""
+		runs = self._row_runs
+		i = bisect.bisect_right(runs, row) - 1
+		if i >= 0 and row < runs[i] + self._row_spans[runs[i]]:
+			return runs[i]
+		return -1
+
+	def _find_column_run(self, row: int, column: int) -> int:
+		"""
+			Возвращает номер первого столбца повтора в строке `row` (из `_cells`), \
+			включающего столбец `column`, или `-1`, если такого нет.
+		"""
+		runs = self._column_runs.get(row)
+		if runs is None:
+			return -1
+		i = bisect.bisect_right(runs, column) - 1
+		if i >= 0 and column < runs[i] + self._column_spans[row][runs[i]]:
+			return runs[i]
+		return -1
+
+	def _split_row(self, start: int, row: int) -> None:
+		"""
+			Разбивает повтор строки `start` так, чтобы строка `row` в нем \
+			стала отдельной строкой со своими (скопированными) ячейками.
+		"""
+		row_span = self._row_spans.get(start, 1)
+		if row_span == 1:
+			return
+		end = start + row_span
+
+		del self._row_spans[start]
+		del self._row_runs[bisect.bisect_left(self._row_runs, start)]
+
+		cells = self._cells[start]
+		column_spans = self._column_spans.get(start)
+		column_runs = self._column_runs.get(start)
+
+		if row > start:
+			self._add_row(start, row - start, cells, column_spans, column_runs)
+		for i, n in ((row, 1), (row + 1, end - row - 1)):
+			if n <= 0:
+				continue
+			if i == start:
+				self._add_row(i, n, cells, column_spans, column_runs)
+			else:
+				self._add_row(
+					i,
+					n,
+					dict(cells),
+					None if column_spans is None else dict(column_spans),
+					None if column_runs is None else list(column_runs),
+				)
+
+	def _add_row(
+			self,
+			row: int,
+			row_span: int,
+			cells: dict[int, Cell],
+			column_spans: 'dict[int, int]|None',
+			column_runs: 'list[int]|None',
+			) -> None:
+		self._cells[row] = cells
+		if column_runs is not None:
+			self._column_spans[row] = column_spans
+			self._column_runs[row] = column_runs
+		if row_span > 1:
+			self._row_spans[row] = row_span
+			bisect.insort(self._row_runs, row)
+
+	def _split_column_run(self, row: int, column: int) -> None:
+		"""
+			Разбивает повтор ячейки в строке `row` (из `_cells`), включающий \
+			столбец `column`, на повторы до `column` и с `column`.
+		"""
+		runs = self._column_runs.get(row)
+		if runs is None:
+			return
+		i = bisect.bisect_right(runs, column) - 1
+		if i < 0:
+			return
+		start = runs[i]
+		spans = self._column_spans[row]
+		end = start + spans[start]
+		if not start < column < end:
+			return
+
+		cells = self._cells[row]
+		cells[column] = cells[start]
+		if column - start > 1:
+			spans[start] = column - start
+		else:
+			del spans[start]
+			del runs[i]
+			i -= 1
+		if end - column > 1:
+			spans[column] = end - column
+			runs.insert(i + 1, column)
+
+	def _clear_columns(self, row: int, begin: int, end: int) -> None:
+		"""
+			Удаляет ячейки строки `row` (из `_cells`) в столбцах с `begin` \
+			по `end - 1`, разбивая повторы на границах.
+		"""
+		self._split_column_run(row, begin)
+		self._split_column_run(row, end)
+
+		cells = self._cells[row]
+		runs = self._column_runs.get(row)
+		if runs is not None:
+			spans = self._column_spans[row]
+			i = bisect.bisect_left(runs, begin)
+			j = bisect.bisect_left(runs, end)
+			for column in runs[i:j]:
+				del spans[column]
+			del runs[i:j]
+			if len(runs) == 0:
+				del self._column_spans[row]
+				del self._column_runs[row]
+
+		if end - begin <= len(cells):
+			for column in range(begin, end):
+				cells.pop(column, None)
+		else:
+			for column in [c for c in cells if begin <= c < end]:
+				del cells[column]
+
+
+class ColumnarTable(BaseTable):
+	"""
+		Таблица (лист) в Spreadsheet (см. `BaseTable`) с компактным хранением \
+		ячеек.
+
+		Ячейки всей таблицы хранятся в массивах (`array`), упорядоченных \
+		по строкам, а внутри строки - по столбцам: номер столбца, число \
+		повторений, значение (`float`), номер `value_type` в небольшом списке \
+		типов, номера текста и формулы в общем для таблицы пуле строк \
+		(одинаковые строки хранятся один раз). Для строк хранятся \
+		отсортированные номера, числа повторений и позиции их первых ячеек \
+		в этих массивах.
+
+		Объекты `Cell` не хранятся, а создаются при каждом `get_cell()`. \
+		Значения ячеек всегда `float`.
+	"""
+	def __init__(self) -> None:
+		super().__init__()
+
+		self._rows: array.array = array.array("i")  # номера строк, по возрастанию
+		self._rows_spans: array.array = array.array("I")  # числа повторений строк
+		self._rows_starts: array.array = array.array("I")  # позиции первых ячеек строк
+
+		self._columns: array.array = array.array("i")
+		self._columns_spans: array.array = array.array("I")
+		self._values: array.array = array.array("d")
+		self._value_types: array.array = array.array("B")  # номера в `_value_types_pool`
+		self._formulas: array.array = array.array("I")  # номера в `_strings`
+		self._texts: array.array = array.array("I")  # номера в `_strings`
+
+		self._strings: list[str] = [""]
+		self._strings_ids: dict[str, int] = {"": 0}
+		self._value_types_pool: list[str] = [""]
+		self._value_types_ids: dict[str, int] = {"": 0}
+
+	def set_cell(self, row: int, column: int, cell: Cell, column_span: int = 1) -> None:
+		self._version += 1
+		if row >= self._row_count:
+			self._row_count = row + 1
+		if column + column_span > self._column_count:
+			self._column_count = column + column_span
+
+		value_type = _get_pool_id(self._value_types_pool, self._value_types_ids, cell.value_type())
+		formula = _get_pool_id(self._strings, self._strings_ids, cell.formula())
+		text = _get_pool_id(self._strings, self._strings_ids, cell.text())
+
+		rows = self._rows
+		n_rows = len(rows)
+		if n_rows > 0 and rows[-1] == row and self._rows_spans[-1] == 1:
+			ri = n_rows - 1
+		elif n_rows == 0 or rows[-1] + self._rows_spans[-1] <= row:
+			ri = n_rows
+			rows.append(row)
+			self._rows_spans.append(1)
+			self._rows_starts.append(len(self._columns))
+		else:
+			ri = self._find_row_index(row)
+			if ri != -1:
+				ri = self._split_row_by_index(ri, row)
+			else:
+				ri = bisect.bisect_left(rows, row)
+				rows.insert(ri, row)
+				self._rows_spans.insert(ri, 1)
+				self._rows_starts.insert(ri, self._rows_starts[ri])
+
+		start, end = self._get_row_range(ri)
+		columns = self._columns
+		if start == end or columns[end - 1] + self._columns_spans[end - 1] <= column:
+			i = end
+		else:
+			self._split_column_run_by_index(ri, column)
+			self._split_column_run_by_index(ri, column + column_span)
+			start, end = self._get_row_range(ri)
+			i = bisect.bisect_left(columns, column, start, end)
+			j = bisect.bisect_left(columns, column + column_span, start, end)
+			if j == i + 1:
+				columns[i] = column
+				self._columns_spans[i] = column_span
+				self._values[i] = cell.value()
+				self._value_types[i] = value_type
+				self._formulas[i] = formula
+				self._texts[i] = text
+				return
+			if j > i:
+				for a in self._get_cells_arrays():
+					del a[i:j]
+				self._shift_rows_starts(ri, i - j)
+
+		columns.insert(i, column)
+		self._columns_spans.insert(i, column_span)
+		self._values.insert(i, cell.value())
+		self._value_types.insert(i, value_type)
+		self._formulas.insert(i, formula)
+		self._texts.insert(i, text)
+		self._shift_rows_starts(ri, 1)
+
+	def set_row_span(self, row: int, row_span: int) -> None:
+		if row_span <= 1:
+			return
+		ri = self._find_row_index(row)
+		if ri == -1:
+			return
+		ri = self._split_row_by_index(ri, row)
+
+		if ri + 1 < len(self._rows) and self._rows[ri + 1] < row + row_span:
+			raise Exception(f"Cannot repeat row {row} {row_span} times in table '{self._name}': next rows are not empty")
+		self._rows_spans[ri] = row_span
+		self._row_count = max(self._row_count, row + row_span)
+		self._version += 1
+
+	def get_cell(self, row: int, column: int) -> 'Cell':
+		i = self._find(row, column)
+		if i == -1:
+			return Cell()
+		return self._make_cell(i)
+
+	def get_block(self, row: int, column: int, row_count: int, column_count: int) -> list[list[Cell]]:
+		result: list[list[Cell]] = []
+		columns = self._columns
+		spans = self._columns_spans
+		last_ri = -1
+		for i in range(row, row + row_count):
+			ri = self._find_row_index(i)
+			if ri != -1 and ri == last_ri:  # та же повторенная строка
+				result.append(list(result[-1]))
+				continue
+			last_ri = ri
+
+			if ri == -1:
+				result.append([Cell() for _ in range(column_count)])
+				continue
+
+			start, end = self._get_row_range(ri)
+			k = max(start, bisect.bisect_right(columns, column, start, end) - 1)
+			block_row: list[Cell] = []
+			for j in range(column, column + column_count):
+				while k < end and columns[k] + spans[k] <= j:
+					k += 1
+				block_row.append(self._make_cell(k) if k < end and columns[k] <= j else Cell())
+			result.append(block_row)
+		return result
+
+	def _get_numpy_runs(self, np: typing.Any) -> tuple:
+		def from_array(a: array.array):
+			return np.frombuffer(a, dtype=a.typecode)
+
+		starts = from_array(self._rows_starts).astype(np.int64)
+		rows_indices = np.repeat(np.arange(len(self._rows)), np.diff(starts, append=len(self._columns)))
+		return (
+			from_array(self._rows).astype(np.int64)[rows_indices],
+			from_array(self._columns).astype(np.int64),
+			from_array(self._rows_spans).astype(np.int64)[rows_indices],
+			from_array(self._columns_spans).astype(np.int64),
+			from_array(self._values),
+			from_array(self._value_types).astype(np.int64),
+			list(self._value_types_pool),
+		)
+
+	def iterate_runs(self) -> 'typing.Iterator[tuple[int, int, int, int, Cell]]':
+		for ri, row in enumerate(self._rows):
+			row_span = self._rows_spans[ri]
+			start, end = self._get_row_range(ri)
+			for i in range(start, end):
+				yield (row, self._columns[i], row_span, self._columns_spans[i], self._make_cell(i))
+
+	def iterate_rows_texts(self) -> 'typing.Iterator[tuple[int, int, list[str]]]':
+		columns = self._columns
+		spans = self._columns_spans
+		for ri, row in enumerate(self._rows):
+			start, end = self._get_row_range(ri)
+			yield (
+				row,
+				self._rows_spans[ri],
+				_get_row_texts((columns[i], spans[i], self._strings[self._texts[i]]) for i in range(start, end)),
+			)
+
+	def _get_row_range(self, ri: int) -> tuple[int, int]:
+		"""
+			Возвращает позиции первой ячейки строки номер `ri` (в `_rows`) \
+			и ячейки после последней.
+		"""
+		start = self._rows_starts[ri]
+		end = self._rows_starts[ri + 1] if ri + 1 < len(self._rows_starts) else len(self._columns)
+		return (start, end)
+
+	def _get_cells_arrays(self) -> list[array.array]:
+		return [
+			self._columns,
+			self._columns_spans,
+			self._values,
+			self._value_types,
+			self._formulas,
+			self._texts,
+		]
+
+	def _shift_rows_starts(self, ri: int, n: int) -> None:
+		"""
+			Сдвигает позиции первых ячеек строк после строки номер `ri` (в `_rows`) \
+			на `n`.
+		"""
+		starts = self._rows_starts
+		for j in range(ri + 1, len(starts)):
+			starts[j] += n
+
+	def _find_row_index(self, row: int) -> int:
+		"""
+			Возвращает номер (в `_rows`) строки, которая (с повторами) включает \
+			строку `row`, или `-1`, если такой нет.
+		"""
+		rows = self._rows
+		ri = bisect.bisect_right(rows, row) - 1
+		if ri < 0 or row >= rows[ri] + self._rows_spans[ri]:
+			return -1
+		return ri
+
+	def _find(self, row: int, column: int) -> int:
+		"""
+			Возвращает позицию ячейки (или её повтора) в массивах или `-1`, \
+			если её нет.
+		"""
+		ri = self._find_row_index(row)
+		if ri == -1:
+			return -1
+		start, end = self._get_row_range(ri)
+		i = bisect.bisect_right(self._columns, column, start, end) - 1
+		if i < start or column >= self._columns[i] + self._columns_spans[i]:
+			return -1
+		return i
+
+	def _split_row_by_index(self, ri: int, row: int) -> int:
+		"""
+			Разбивает повтор строки номер `ri` (в `_rows`) так, чтобы строка \
+			`row` в нем стала отдельной строкой со своими (скопированными) \
+			ячейками.
+
+			Возвращает номер этой строки в `_rows`.
+		"""
+		rows = self._rows
+		spans = self._rows_spans
+		start_row = rows[ri]
+		end_row = start_row + spans[ri]
+		if end_row - start_row == 1:
+			return ri
+
+		start, end = self._get_row_range(ri)
+		segment = [a[start:end] for a in self._get_cells_arrays()]
+
+		if row > start_row:
+			spans[ri] = row - start_row
+			ri += 1
+			self._insert_row(ri, row, 1, segment)
+		else:
+			spans[ri] = 1
+		if end_row - row > 1:
+			self._insert_row(ri + 1, row + 1, end_row - row - 1, segment)
+		return ri
+
+	def _insert_row(self, ri: int, row: int, row_span: int, segment: list[array.array]) -> None:
+		"""
+			Вставляет строку номер `ri` (в `_rows`) с ячейками `segment` \
+			(см. `_get_cells_arrays()`).
+		"""
+		i = self._rows_starts[ri] if ri < len(self._rows) else len(self._columns)
+		self._rows.insert(ri, row)
+		self._rows_spans.insert(ri, row_span)
+		self._rows_starts.insert(ri, i)
+		for a, s in zip(self._get_cells_arrays(), segment):
+			a[i:i] = s
+		self._shift_rows_starts(ri, len(segment[0]))
+
+	def _split_column_run_by_index(self, ri: int, column: int) -> None:
+		"""
+			Разбивает повтор ячейки в строке номер `ri` (в `_rows`), включающий \
+			столбец `column`, на повторы до `column` и с `column`.
+		"""
+		start, end = self._get_row_range(ri)
+		i = bisect.bisect_right(self._columns, column, start, end) - 1
+		if i < start:
+			return
+		column_start = self._columns[i]
+		column_end = column_start + self._columns_spans[i]
+		if not column_start < column < column_end:
+			return
+
+		self._columns_spans[i] = column - column_start
+		for a in self._get_cells_arrays():
+			a.insert(i + 1, a[i])
+		self._columns[i + 1] = column
+		self._columns_spans[i + 1] = column_end - column
+		self._shift_rows_starts(ri, 1)
+
+	def _make_cell(self, i: int) -> Cell:
+		cell = Cell()
+		cell.init(
+			self._values[i],
+			self._strings[self._formulas[i]],
+			self._strings[self._texts[i]],
+			self._value_types_pool[self._value_types[i]],
+		)
+		return cell
+
+
+def _get_row_texts(runs: 'typing.Iterable[tuple[int, int, str]]') -> list[str]:
+	"""
+		Возвращает тексты ячеек строки по её ячейкам `runs` \
+		(`(column, column_span, text)`): от первого столбца до последней \
+		непустой ячейки, на месте отсутствующих и пустых ячеек - `""`.
+	"""
+	texts: list[str] = []
+	for column, column_span, text in sorted(runs):
+		if text == "":
+			continue
+		if len(texts) < column:
+			texts.extend([""] * (column - len(texts)))
+		texts.extend([text] * column_span)
+	return texts
+
+
+def _get_pool_id(pool: list[str], ids: dict[str, int], s: str) -> int:
+	"""
+		Возвращает номер строки `s` в пуле `pool` (`ids` - номера строк пула), \
+		добавляя её в пул, если её там нет.
+	"""
+	i = ids.get(s)
+	if i is None:
+		i = len(pool)
+		pool.append(s)
+		ids[s] = i
+	return i
+
+
+# Форматы `BaseTable.export()` и соответствующие диалекты модуля `csv`
+EXPORT_FORMATS: dict[str, str] = {
+	"tsv": "excel-tab",
+	"csv": "excel",
+}
+
+
+# Типы значений (`office:value-type`) ячеек с числовыми значениями
+NUMERIC_VALUE_TYPES: set[str] = {"float", "percentage", "currency"}
+
+
+def _import_numpy() -> typing.Any:
+	"""
+		Импортирует NumPy - необязательную зависимость, нужную только \
+		для `BaseTable.to_numpy()`.
+	"""
+	try:
+		import numpy
+	except ImportError:
+		raise Exception("NumPy is required for Table.to_numpy(): pip install numpy")
+	return numpy
+
+
+def _get_runs_offsets(np: typing.Any, spans: typing.Any) -> typing.Any:
+	"""
+		Возвращает для повторов длиной `spans` (массив NumPy), раскрытых \
+		в `numpy.repeat(..., spans)`, номера элементов внутри своего повтора.
+	"""
+	ends = np.cumsum(spans)
+	return np.arange(ends[-1] if len(ends) > 0 else 0) - np.repeat(ends - spans, spans)
+
+
+# Класс, объекты которого создаются для листов при чтении `Spreadsheet`
+# (`Table` или `ColumnarTable`)
+TABLE_CLASS: 'type[BaseTable]' = Table
+
 
 class Spreadsheet():
 	"""
-		Набор таблиц (листов) (`Table`) и именованных выражений (`NamedExpression`).
+		Набор таблиц (листов) (`BaseTable`) и именованных выражений (`NamedExpression`).
 	"""
 
 	VIRTUAL_SHEET_NAME = "__VIRTUAL_SHEET"
 
 	def __init__(self) -> None:
-		self._sheets: dict[str, Table] = {}
+		self._sheets: dict[str, BaseTable] = {}
 		self._named_exprs: dict[str, NamedExpression] = {}
 
 	def get_cell(self, addr: Address) -> Cell:
 		return self.get_table(addr.sheet()).get_cell(addr.row(), addr.column())
 
-	def get_table(self, table_name: str) -> Table:
+	def get_block(self, addr_range: AddressRange) -> list[list[Cell]]:
+		"""
+			Возвращает ячейки диапазона `addr_range` (см. `BaseTable.get_block()`).
+		"""
+		start = addr_range.start()
+		return self.get_table(addr_range.sheet()) \
+			.get_block(start.row(), start.column(), addr_range.row_count(), addr_range.column_count())
+
+	def to_numpy(self, table_name: str, columns: 'typing.Sequence[int]|None' = None) -> 'tuple[typing.Any, dict[str, typing.Any]]':
+		"""
+			Возвращает значения и маски типов значений ячеек листа `table_name` \
+			массивами NumPy (см. `BaseTable.to_numpy()`).
+		"""
+		return self.get_table(table_name).to_numpy(columns)
+
+	def get_table(self, table_name: str) -> BaseTable:
 		if table_name in self._sheets:
 			return self._sheets[table_name]
 		return Table()
 
-	def tables(self) -> list[Table]:
+	def tables(self) -> list[BaseTable]:
 		return self._sheets.values()
 
-	def set_table(self, t: Table) -> None:
+	def set_table(self, t: BaseTable) -> None:
 		self._sheets[t.name()] = t
 
 	def set_named_expression(self, ne: NamedExpression) -> None:
@@ -274,8 +1456,8 @@ class Spreadsheet():
 	def named_expressions(self) -> list[NamedExpression]:
 		return self._named_exprs.values()
 
-	def create_table(self, name: str) -> Table:
-		t = Table()
+	def create_table(self, name: str) -> BaseTable:
+		t = TABLE_CLASS()
 		t._name = name
 		self.set_table(t)
 		return t
@@ -283,17 +1465,116 @@ class Spreadsheet():
 	def has_table(self, name: str) -> bool:
 		return name in self._sheets
 
-	def ensure_table(self, name: str) -> Table:
+	def ensure_table(self, name: str) -> BaseTable:
 		"""
-			Возвращает `Table` с именем `name`. Если такой таблицы нет, создает её.
+			Возвращает таблицу с именем `name`. Если такой таблицы нет, создает её.
 		"""
 		if not self.has_table(name):
 			return self.create_table(name)
 		return self.get_table(name)
 
 
+def diff_tables(old: BaseTable, new: BaseTable) -> 'list[int]|None':
+	"""
+		Возвращает номера строк (по возрастанию), в которых ячейки таблиц `old` \
+		и `new` различаются, или `None`, если различаются и положения непустых \
+		ячеек (см. `Cell.is_empty()`).
+	"""
+	old_rows = _get_rows_contents(old)
+	new_rows = _get_rows_contents(new)
+
+	rows: list[int] = []
+	for row in sorted(old_rows.keys() | new_rows.keys()):
+		old_runs = old_rows.get(row, [])
+		new_runs = new_rows.get(row, [])
+		if old_runs == new_runs:
+			continue
+		if _get_non_empty_spans(old_runs) != _get_non_empty_spans(new_runs):
+			return None
+		rows.append(row)
+	return rows
+
+
+def diff_spreadsheets(old: Spreadsheet, new: Spreadsheet) -> 'list[Address]|None':
+	"""
+		Возвращает адреса (`column == 0`) строк, в которых ячейки `old` и `new` \
+		различаются (см. `diff_tables()`), или `None`, если различаются наборы \
+		листов, именованные выражения или положения непустых ячеек.
+
+		Виртуальный лист (`Spreadsheet.VIRTUAL_SHEET_NAME`) и именованные \
+		выражения на нём не сравниваются.
+	"""
+	def get_named_exprs(ss: Spreadsheet) -> dict[str, 'Address|AddressRange']:
+		return {
+			ne.name(): ne.address() for ne in ss.named_expressions()
+			if ne.address().sheet() != Spreadsheet.VIRTUAL_SHEET_NAME
+		}
+
+	def get_tables(ss: Spreadsheet) -> dict[str, BaseTable]:
+		return {t.name(): t for t in ss.tables() if t.name() != Spreadsheet.VIRTUAL_SHEET_NAME}
+
+	if get_named_exprs(old) != get_named_exprs(new):
+		return None
+
+	old_tables = get_tables(old)
+	new_tables = get_tables(new)
+	if old_tables.keys() != new_tables.keys():
+		return None
+
+	addresses: list[Address] = []
+	for name, t in new_tables.items():
+		rows = diff_tables(old_tables[name], t)
+		if rows is None:
+			return None
+		addresses.extend(Address(name, row, 0) for row in rows)
+	return addresses
+
+
+def _get_rows_contents(table: BaseTable) -> dict[int, list[tuple[int, int, tuple]]]:
+	"""
+		Возвращает по номерам строк таблицы их заполненные ячейки: \
+		`(column, column_span, (value, value_type, formula, text))` по \
+		возрастанию `column`, соседние одинаковые - одним элементом.
+	"""
+	rows: dict[int, list[tuple[int, int, tuple]]] = {}
+	for row, column, row_span, column_span, cell in table.iterate_runs():
+		if cell.text() == "" and cell.formula() == "" and cell.value_type() == "":
+			continue
+		key = (cell.value().__class__, cell.value(), cell.value_type(), cell.formula(), cell.text())  # чтобы не смешивать 0 и 0.0
+		for r in range(row, row + row_span):
+			rows.setdefault(r, []).append((column, column_span, key))
+
+	for row, runs in rows.items():
+		runs.sort(key=lambda run: run[0])
+		merged: list[tuple[int, int, tuple]] = [runs[0]]
+		for column, column_span, key in runs[1:]:
+			last_column, last_span, last_key = merged[-1]
+			if last_column + last_span == column and last_key == key:
+				merged[-1] = (last_column, last_span + column_span, key)
+			else:
+				merged.append((column, column_span, key))
+		rows[row] = merged
+	return rows
+
+
+def _get_non_empty_spans(runs: list[tuple[int, int, tuple]]) -> list[tuple[int, int]]:
+	"""
+		Возвращает столбцы непустых ячеек из `runs` (см. `_get_rows_contents()`) \
+		отрезками `(column, column_end)`, соседние - одним отрезком.
+	"""
+	spans: list[tuple[int, int]] = []
+	for column, column_span, key in runs:
+		if key[-1] == "":
+			continue
+		if len(spans) > 0 and spans[-1][1] == column:
+			spans[-1] = (spans[-1][0], column + column_span)
+		else:
+			spans.append((column, column + column_span))
+	return spans
+
+
 def _parse_cell(
-		table: Table,
+		table: BaseTable,
 		node: xml_parser.NodeTag,
 		row_counter: int,
 		column_counter: int
@@ -321,25 +1602,24 @@ def _parse_cell(
 	cell.init(value, formula, text, value_type)
 
 	if not cell.is_empty():
-		for i in range(col_span):
-			table.set_cell(row_counter, column_counter + i, cell)
+		table.set_cell(row_counter, column_counter, cell, col_span)
 
 	return column_counter + col_span
 
 
-def _parse_rows(table: Table, node: xml_parser.NodeTag, row_counter: int) -> int:
+def _parse_rows(table: BaseTable, node: xml_parser.NodeTag, row_counter: int) -> int:
 	row_span = int(node.get_option("table:number-rows-repeated", "1"))
 
-	if row_span == 1:
-		column_counter = 0
-		for cell in xml_parser.iterate_tags(node.children):
-			column_counter = _parse_cell(table, cell, row_counter, column_counter)
+	column_counter = 0
+	for cell in xml_parser.iterate_tags(node.children):
+		column_counter = _parse_cell(table, cell, row_counter, column_counter)
+	table.set_row_span(row_counter, row_span)
 
 	return row_counter + row_span
 
 
-def _parse_table(table_tag: xml_parser.NodeTag) -> Table:
-	table = Table()
+def _parse_table(table_tag: xml_parser.NodeTag, table_class: 'type[BaseTable]|None' = None) -> BaseTable:
+	table = (TABLE_CLASS if table_class is None else table_class)()
 	row_counter: int = 0
 
 	table._name = table_tag.get_option("table:name", "")
@@ -356,10 +1636,86 @@ def _parse_named_exprs(tag_ne: xml_parser.NodeTag):
 	for node in xml_parser.iterate_tags(tag_ne.children):
 		if node.name == "table:named-range":
 			name = node.get_option("table:name", "")
-			addr = Address.from_text(node.get_option("table:cell-range-address", ""))
+			addr = parse_address(node.get_option("table:cell-range-address", ""))
 			ne = NamedExpression(name, addr)
 			NEs.append(ne)
 		else:
 			raise Exception("Unknown tag: " + repr(node))
 	return NEs
 
+
+
+if __name__ == "__main__":
+	# Замер полного цикла (чтение XML, `CalcObject`, TeX) на широком листе:
+	#     python spreadsheet_parser.py [<rows> [<columns>]]
+	import sys
+	import time
+
+	import spreadsheet_parser as sp  # те же классы, что и в `calc_object` и `tex_constructor`
+	import tex_constructor
+
+	n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+	n_columns = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+	class ScanningTable(sp.Table):
+		"""
+			`Table`, размеры которой считаются перебором ячеек при каждом вызове, \
+			как до их учета в `set_cell()`.
+		"""
+		def get_row_count(self) -> int:
+			return max((row + row_span for row, _, row_span, _, _ in self.iterate_runs()), default=0)
+
+		def get_column_count(self) -> int:
+			return max((column + column_span for _, column, _, column_span, _ in self.iterate_runs()), default=1)
+
+	headers = ["data", "texput", "unit_texput", "description"]
+
+	def make_xml() -> bytes:
+		def cell(text: str, value: str = "", formula: str = "") -> str:
+			options = ' office:value-type="string"' if value == "" \
+				else f' office:value-type="float" office:value="{value}"'
+			if formula != "":
+				options += f' table:formula="of:={formula}"'
+			return f'<table:table-cell{options}><text:p>{text}</text:p></table:table-cell>'
+
+		rows = ["".join(cell(h) for h in headers + [f"x{j}" for j in range(n_columns - len(headers))])]
+		for i in range(1, n_rows):
+			value = 1.0 + i
+			formula = "" if i == 1 else f"[.A{i}]+1"
+			rows.append(
+				cell(f"{value}", f"{value}", formula) + cell(f"v_{{{i}}}") + cell("м") + cell(f"Величина {i}")
+				+ f'<table:table-cell table:number-columns-repeated="{n_columns - len(headers)}" office:value-type="float" office:value="{i}"><text:p>{i}</text:p></table:table-cell>'
+			)
+		rows.append('<table:table-row table:number-rows-repeated="1048000"><table:table-cell table:number-columns-repeated="1024"/></table:table-row>')
+		return (
+			'<?xml version="1.0" encoding="UTF-8"?><office:document-content><office:body><office:spreadsheet>'
+			+ '<table:table table:name="wide">'
+			+ "".join(r if r.startswith("<table:table-row") else f"<table:table-row>{r}</table:table-row>" for r in rows)
+			+ '</table:table></office:spreadsheet></office:body></office:document-content>'
+		).encode("utf-8")
+
+	xml = make_xml()
+	print(f"{n_rows} x {n_columns} cells, {len(xml)} bytes of XML")
+
+	for table_class in [ScanningTable, sp.Table, sp.ColumnarTable]:
+		sp.TABLE_CLASS = table_class
+
+		t0 = time.perf_counter()
+		ss = sp.load_spreadsheet(lambda: io.BytesIO(xml))
+		t1 = time.perf_counter()
+
+		# Так размеры листа запрашивались, пока индексы заголовков не кэшировались:
+		# поиск каждого столбца по заголовку для каждой строки перебирал столбцы
+		# до `get_column_count()`
+		table = ss.get_table("wide")
+		for _ in range(1, table.get_row_count()):
+			for _ in headers:
+				table.get_column_count()
+		t2 = time.perf_counter()
+
+		doc = tex_constructor.Document(ss)
+		addresses = [co.address() for co in doc._COF.iterate_calc_objects("wide")]
+		doc.process(addresses)
+		t3 = time.perf_counter()
+
+		print(f"{table_class.__name__:>15}: load {t1 - t0:.3f} s, dimensions {t2 - t1:.3f} s, TeX {t3 - t2:.3f} s ({len(doc.string())} chars)")
@@ -1,3 +1,7 @@
+import typing
+import re
+import functools
+
 
 WHITESPACE = [" ", "\r", "\n", "\t"]
 
@@ -19,22 +23,74 @@ def check_for_substr_from_start(
 	return False
 
 
+@functools.lru_cache(maxsize=256)
+def _get_substrs_matcher(substrs: tuple[str, ...]) -> 're.Pattern[str]':
+	"""
+		Возвращает скомпилированный RegExp-альтернативу подстрок `substrs`. \
+		При совпадении нескольких подстрок в одной позиции выбирается \
+		первая по порядку, как в `slice_until()`.
+	"""
+	return re.compile("|".join(re.escape(s) for s in substrs))
+
+
+def _chars_class(chars: tuple[str, ...]) -> str:
+	return "".join(re.escape(c) for c in chars if len(c) == 1)
+
+
+@functools.lru_cache(maxsize=256)
+def _get_non_escaped_char_matcher(chars: tuple[str, ...]) -> 're.Pattern[str]':
+	if _chars_class(chars) == "":
+		return re.compile(r'(?!)')
+	return re.compile(r'(?<!\\)[' + _chars_class(chars) + ']')
+
+
+@functools.lru_cache(maxsize=256)
+def _get_not_chars_matcher(chars: tuple[str, ...]) -> 're.Pattern[str]':
+	if _chars_class(chars) == "":
+		return re.compile(r'[\s\S]')
+	return re.compile('[^' + _chars_class(chars) + ']')
+
+
 def slice_until(
 		text: str,
 		substrs: list[str],
 		start_i: int = 0,
 		can_be_escaped: bool = True,
 		) -> tuple[str, int]:
-	i = start_i
-
-	while i < len(text):
-		for s in substrs:
-			if check_for_substr_from_start(text, s, i):
-				return (text[start_i : i], i + len(s))
-		else:
-			i += 1
-
-	return (text[start_i : ], len(text))
+	"""
+		Ищет, начиная с позиции `start_i`, ближайшее вхождение любой из подстрок \
+		`substrs` (при совпадении в одной позиции - первой по порядку).
+
+		Возвращает текст от `start_i` до вхождения и позицию сразу после него; \
+		если вхождения нет - текст до конца и `len(text)`.
+
+		Как и `check_for_substr_from_start()`, у самого конца текста, где подстрока \
+		целиком не помещается, она считается найденной по первому символу \
+		(на этом основан поиск `"/>"` в `xml_parser.parse_xml_recursive()`).
+	"""
+	n = len(text)
+
+	if len(substrs) == 1:
+		i = text.find(substrs[0], start_i)
+	else:
+		m = _get_substrs_matcher(tuple(substrs)).search(text, start_i)
+		i = -1 if m is None else m.start()
+	if i == -1:
+		i = n
+
+	for s in substrs:
+		if len(s) > 1 and n - len(s) < i:
+			j = text.find(s[0], max(start_i, n - len(s)), i)
+			if j != -1:
+				i = j
+
+	if i >= n:
+		return (text[start_i : ], n)
+
+	for s in substrs:
+		if check_for_substr_from_start(text, s, i):
+			return (text[start_i : i], i + len(s))
+	raise Exception(f"Cannot find any of {substrs} at position {i}")  # недостижимо
 
 
 def slice_until_non_escaped_char(
@@ -42,22 +98,28 @@ def slice_until_non_escaped_char(
 	    char: list[str],
 	    start_i: int = 0
 	    ) -> tuple[str, int]:
-	i = start_i
-	while i < len(text):
-		if text[i] in char:
-			if i == 0 or (i > 0 and text[i - 1] != "\\"):
-				return (text[start_i : i], i + 1)
-		i += 1
-	return (text[start_i : ], i)
+	"""
+		Ищет, начиная с позиции `start_i`, ближайший из символов `char`, \
+		перед которым нет обратной косой черты.
+
+		Возвращает текст от `start_i` до символа и позицию сразу после него; \
+		если символа нет - текст до конца и `len(text)`.
+	"""
+	m = _get_non_escaped_char_matcher(tuple(char)).search(text, start_i)
+	if m is None:
+		return (text[start_i : ], max(len(text), start_i))
+	return (text[start_i : m.start()], m.end())
 
 
 def skip_chars(text: str, chars: list[str], i_start: int = 0) -> int:
-	i = i_start
-	while i < len(text):
-		if not text[i] in chars:
-			break
-		i += 1
-	return i
+	"""
+		Возвращает позицию первого символа, начиная с `i_start`, которого \
+		нет в `chars`; если таких нет - `len(text)`.
+	"""
+	m = _get_not_chars_matcher(tuple(chars)).search(text, i_start)
+	if m is None:
+		return max(len(text), i_start)
+	return m.start()
 
 
 def find_pair(text: str, pos_start: int):
@@ -108,3 +170,56 @@ def safe_int(text: str, default: int) -> int:
 	except Exception as e:
 		return default
 
+
+
+if __name__ == "__main__":
+	# Сравнение скорости со старыми посимвольными реализациями:
+	#     python str_utils.py
+	import time
+
+	def slice_until_loop(text: str, substrs: list[str], start_i: int = 0) -> tuple[str, int]:
+		i = start_i
+		while i < len(text):
+			for s in substrs:
+				if check_for_substr_from_start(text, s, i):
+					return (text[start_i : i], i + len(s))
+			else:
+				i += 1
+		return (text[start_i : ], len(text))
+
+	def slice_until_non_escaped_char_loop(text: str, char: list[str], start_i: int = 0) -> tuple[str, int]:
+		i = start_i
+		while i < len(text):
+			if text[i] in char:
+				if i == 0 or (i > 0 and text[i - 1] != "\\"):
+					return (text[start_i : i], i + 1)
+			i += 1
+		return (text[start_i : ], i)
+
+	def skip_chars_loop(text: str, chars: list[str], i_start: int = 0) -> int:
+		i = i_start
+		while i < len(text):
+			if not text[i] in chars:
+				break
+			i += 1
+		return i
+
+	def bench(name: str, f_new: typing.Callable, f_old: typing.Callable, *args) -> None:
+		t = time.perf_counter()
+		r_new = f_new(*args)
+		t_new = time.perf_counter() - t
+		t = time.perf_counter()
+		r_old = f_old(*args)
+		t_old = time.perf_counter() - t
+		assert r_new == r_old
+		print(f"{name:>40}: {t_old:8.3f} s -> {t_new:8.5f} s (x{t_old / t_new:.0f})")
+
+	for size in [1 << 20, 4 << 20]:
+		print(f"{size >> 20} MB:")
+		text = "<a b=\"c\\\" d\">text</a>" * (size // 22) + "</end>"
+		bench("slice_until, 1 substr", slice_until, slice_until_loop, text, ["</end>"])
+		bench("slice_until, 3 substrs", slice_until, slice_until_loop, text, ["</end>", "<b", "/>"])
+		text = "abc \\\" " * (size // 7) + "\""
+		bench("slice_until_non_escaped_char", slice_until_non_escaped_char, slice_until_non_escaped_char_loop, text, ["\""])
+		text = " \t\r\n" * (size // 4) + "x"
+		bench("skip_chars", skip_chars, skip_chars_loop, text, WHITESPACE)
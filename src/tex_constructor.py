@@ -17,15 +17,30 @@ class Document():
         self._spreadsheet: sp.Spreadsheet = spreadsheet
         self._COF: calc_object.CalcObjectsFactory = calc_object.CalcObjectsFactory(spreadsheet)
 
-        self._known: list[sp.Address] = []
-        self._equation_known: list[sp.Address] = []
-        self._calculated: list[sp.Address] = []
-        self._to_calculate: list[sp.Address] = []  # only which are CalcObject.is_equation()
+        self._known: set[sp.Address] = set()
+        self._equation_known: set[sp.Address] = set()
+        self._calculated: set[sp.Address] = set()
+        self._to_calculate: list[sp.Address] = []  # only which are CalcObject.is_equation(); stack of depth-first traversal
         self._to_process: list[sp.Address] = []
 
+        self._graph: calc_object.DependencyGraph = calc_object.DependencyGraph(self._COF)
+
+        # equations which cannot be calculated yet: by the address (column=0) of
+        # an uncalculated dependency - equations waiting for it, and the number
+        # of dependencies each equation is waiting for
+        self._waiting: dict[sp.Address, list[sp.Address]] = {}
+        self._waiting_counts: dict[sp.Address, int] = {}
+
         self._string: str = ""
         self._current_tabulation: int = 0
 
+        # TeX written by each step of process(): (text, parts, reads), where parts
+        # are the calls of text_*() methods to repeat them in update() (see _render())
+        # and reads are the addresses (column=0) of CalcObjects written in the text
+        self._fragments: list[tuple[str, list[tuple], set[sp.Address]]] = []
+        self._parts: list[tuple] = []
+        self._reads: set[sp.Address] = set()
+
         self.cfg_use_equation_numbers: bool = True
         self.cfg_always_write_where: bool = False
         self.cfg_allow_symbolic_and_numeric_equation: bool = True
@@ -53,25 +68,64 @@ class Document():
         return addr.copy(column=0) in self._calculated or self._COF.get_calc_object(addr).is_constant()
 
     def set_known(self, addr: sp.Address) -> None:
-        self._known.append(addr.copy(column=0))
+        self._known.add(addr.copy(column=0))
 
     def set_equation_known(self, addr: sp.Address) -> None:
-        self._equation_known.append(addr.copy(column=0))
+        self._equation_known.add(addr.copy(column=0))
 
     def set_calculated(self, addr: sp.Address) -> None:
-        self._calculated.append(addr.copy(column=0))
+        key = addr.copy(column=0)
+        self._calculated.add(key)
+
+        # the equations waiting only for this one are scheduled next
+        for waiting in self._waiting.pop(key, []):
+            self._waiting_counts[waiting] -= 1
+            if self._waiting_counts[waiting] == 0:
+                del self._waiting_counts[waiting]
+                self._to_calculate.append(waiting)
+
+    def wait_for_calculated(self, addr: sp.Address, dependencies: list[sp.Address]) -> None:
+        """
+            Откладывает вычисление величины `addr` до вычисления всех \
+            `dependencies`.
+        """
+        keys = set(d.copy(column=0) for d in dependencies)
+        for key in keys:
+            self._waiting.setdefault(key, []).append(addr)
+        self._waiting_counts[addr] = len(keys)
 
     @staticmethod
     def get_label(addr: sp.Address) -> str:
         return "l_" + str(addr)
 
     def append_text(self, s: str) -> str:
+        new_s = self._tabulate(s)
+        self._string += new_s
+        return new_s
+
+    def _tabulate(self, s: str) -> str:
         new_s = ""
         for line in s.splitlines(True):
             new_s += '\t' * self._current_tabulation + line
-        self._string += new_s
         return new_s
 
+    def _get_calc_object(self, addr: sp.Address) -> calc_object.CalcObject:
+        co = self._COF.get_calc_object(addr)
+        self._reads.add(co.address().copy(column=0))
+        return co
+
+    def _render(self, method: typing.Callable[..., str], target: 'calc_object.CalcObject|list[sp.Address]', *args) -> str:
+        """
+            Возвращает `method(target, *args)` и запоминает вызов, чтобы \
+            повторить его в `update()`.
+        """
+        if isinstance(target, calc_object.CalcObject):
+            self._reads.add(target.address().copy(column=0))
+            self._parts.append((method, target.address(), args))
+        else:
+            self._parts.append((method, target, args))
+        return method(target, *args)
+
 
     def text_text(self, co: calc_object.CalcObject) -> str:
         ifdescription = co.description()
@@ -135,7 +189,7 @@ class Document():
         s = "где "
         str_join = ";\n\\\\ \\phantomwhere "
         for addr in addresses:
-            s += self.text_where_line(self._COF.get_calc_object(addr)) + str_join
+            s += self.text_where_line(self._get_calc_object(addr)) + str_join
         s = s[ : -len(str_join)]
         s += ".\n"
         return s
@@ -158,43 +212,63 @@ class Document():
         return f'\\cite[{cite_aux}]{{{cite_name}}}'
 
 
+    def _get_substituted(self, co: calc_object.CalcObject, address: 'sp.Address|sp.AddressRange') -> list[sp.Address]:
+        """
+            Возвращает адреса величин, которые подставляются в формулу `co` \
+            вместо ссылки `address`: без циклических зависимостей \
+            (см. `calc_object.DependencyGraph.is_circular()`), если без них \
+            остается хоть одна величина.
+        """
+        dependencies = list(self._COF.iterate_dependencies([address]))
+        result = [a for a in dependencies if not self._graph.is_circular(co.address(), a)]
+        return result if len(result) > 0 else dependencies
+
     def subst_symbols(self, co: calc_object.CalcObject) -> str:
-        s = co.tex_equation()
+        s = co.tex_equation(self._COF)
         s = tex_utils.fix_comma(s)
 
         s = re.sub(r'\\x\b', " ", s)
 
-        addresses: list[sp.Address] = self._COF.get_dependent_addresses_in_order(co.formula(), co.address().sheet())[1]
+        compiled = self._COF.compile_formula(co.formula(), co.address().sheet())
+        addresses: list['sp.Address|sp.AddressRange'] = compiled.addresses()
+        placeholders: list[str] = list(compiled.placeholders().values())
         for i in range(len(addresses) - 1, -1, -1):
-            co = self._COF.get_calc_object(addresses[i])
-            substr = "#" + str(i + 1)
-            t = co.texput()
+            substr = placeholders[i]
+            t = "; ".join(
+                self._get_calc_object(a).texput() for a in self._get_substituted(co, addresses[i])
+            )
             s = s.replace(substr, t)
         return s
 
     def subst_numbers(self, co: calc_object.CalcObject) -> str:
         try_to_eval: bool = self.cfg_check_tex_equation_by_evaluation
 
-        s = co.tex_equation()
+        s = co.tex_equation(self._COF)
         s = tex_utils.fix_comma(s)
 
         s = re.sub(r'\\x\b', "\\\\cdot", s)
         s_for_eval = s
 
-        addresses: list[sp.Address] = self._COF.get_dependent_addresses_in_order(co.formula(), co.address().sheet())[1]
-        numbers: list[str] = set(re_number_sign.findall(co.tex_equation()))  # 'set' instead of 'list' is for uniquiness of elements
+        compiled = self._COF.compile_formula(co.formula(), co.address().sheet())
+        addresses: list['sp.Address|sp.AddressRange'] = compiled.addresses()
+        placeholders: list[str] = list(compiled.placeholders().values())
+        numbers: list[str] = set(re_number_sign.findall(co.tex_equation(self._COF)))  # 'set' instead of 'list' is for uniquiness of elements
 
         if len(addresses) != len(numbers):
             print(f"Warning: {co.address()}: there are {len(addresses)} dependent addresses, but {len(numbers)} #-numbers. Bad '{calc_object.Headers.tex_equation}'?")
             try_to_eval = False
 
         for i in range(len(addresses) - 1, -1, -1):
-            child = self._COF.get_calc_object(addresses[i])
-            substr = "#" + str(i + 1)
-            ifunit = "" if child.unit_texput() == "" else f' \\text{{~{child.unit_texput()}}}'
-            t = self.text_value(child, False) + (ifunit if (co.subst_units() == -1 and self.cfg_use_units_in_equations) or co.subst_units() == 1 else "")
-            s = s.replace(substr, t)
-            s_for_eval = s_for_eval.replace(substr, str(child.value()))
+            substr = placeholders[i]
+            t_list: list[str] = []
+            t_for_eval_list: list[str] = []
+            for a in self._get_substituted(co, addresses[i]):
+                child = self._get_calc_object(a)
+                ifunit = "" if child.unit_texput() == "" else f' \\text{{~{child.unit_texput()}}}'
+                t_list.append(self.text_value(child, False) + (ifunit if (co.subst_units() == -1 and self.cfg_use_units_in_equations) or co.subst_units() == 1 else ""))
+                t_for_eval_list.append(str(child.value()))
+            s = s.replace(substr, "; ".join(t_list))
+            s_for_eval = s_for_eval.replace(substr, "; ".join(t_for_eval_list))
 
         ### Проверка на совпадение .value() и посчитанного через parse_tex(.tex_equation())
         if try_to_eval:
@@ -216,32 +290,103 @@ class Document():
         return s
 
     def process(self, co_to_process: typing.Iterable[sp.Address]) -> None:
+        """
+            Записывает TeX для величин `co_to_process` и тех, от которых они зависят.
+
+            Величины обходятся в глубину по графу зависимостей \
+            (`calc_object.DependencyGraph`): сначала уравнение в общем виде, \
+            затем неизвестные зависимости, затем вычисление. Величина, которую \
+            пока нельзя вычислить, ждет вычисления своих зависимостей, а не \
+            обрабатывается повторно.
+        """
         self._to_process = iter(co_to_process)
 
         addr = self._next_in_process_queue()
         while not addr is None:
             co = self._COF.get_calc_object(addr)
 
+            self._parts = []
+            self._reads = set()
             s = self._process_CO(co)
 
             if s != "":
                 s += "\n"
-                self.append_text(s)
+                s = self.append_text(s)
+                self._fragments.append((s, self._parts, self._reads))
                 # print(s, end="")
 
             addr = self._next_in_process_queue()
 
-    def _next_in_process_queue(self) -> 'sp.Address|None':
-        i = len(self._to_calculate) - 1
-        while i >= 0:
-            addr = self._to_calculate[i]
+        for addr in self._waiting_counts:
+            print(f"Warning: {addr}: cannot be calculated because of circular or unresolved dependencies")
+
+    def update(self, spreadsheet: sp.Spreadsheet) -> 'int|None':
+        """
+            Обновляет TeX после `process()` по новому содержимому таблицы \
+            `spreadsheet` (например, после сохранения ODS-файла): заново \
+            выводятся только фрагменты, в которых есть величины из строк \
+            с изменившимися ячейками. Результат тот же, что и у нового `Document`.
+
+            Возвращает число обновленных фрагментов или `None`, если изменения \
+            меняют порядок вывода величин (формулы, признаки величин, \
+            заполненность ячеек, заголовки, перенаправления, листы, \
+            именованные выражения): тогда этот `Document` больше не годится \
+            и нужен новый.
+        """
+        rows = sp.diff_spreadsheets(self._spreadsheet, spreadsheet)
+        if rows is None:
+            return None
 
-            # if len(self.get_uncalculated_for(addr)) == 0:
-            # 	return self._to_calculate.pop(i)
+        signatures = [self.get_signature(self._COF.get_calc_object(a)) for a in rows]
+        if not self._COF.replace_tables(spreadsheet, rows):
+            return None
+        if signatures != [self.get_signature(self._COF.get_calc_object(a)) for a in rows]:
+            return None
 
-            return self._to_calculate.pop(i)
+        changed: set[sp.Address] = set(rows)
+        count = 0
+        for i, (s, parts, reads) in enumerate(self._fragments):
+            if reads.isdisjoint(changed):
+                continue
+            self._parts = []
+            self._reads = set()
+            s = "".join(
+                self._render(method, self._COF.get_calc_object(target) if isinstance(target, sp.Address) else target, *args)
+                for method, target, args in parts
+            )
+            self._fragments[i] = (self._tabulate(s + "\n"), self._parts, self._reads)
+            count += 1
+
+        if count > 0:
+            self._string = "".join(s for s, _, _ in self._fragments)
+        return count
+
+    def get_signature(self, co: calc_object.CalcObject) -> tuple:
+        """
+            Возвращает то, от чего зависит порядок вывода величины `co` \
+            в `process()`, но не текст её фрагментов.
+        """
+        value_type = co.value_type()
+        if value_type in ["float", "percentage"]:
+            value_type = "float"
+        elif value_type in ["string", ""]:
+            value_type = "string"
+        return (
+            co.address(),
+            value_type,
+            co.is_redirect(),
+            co.is_constant(),
+            co.is_known(),
+            co.do_not_print(),
+            co.is_empty(),
+            tuple(self._COF.compile_formula(co.formula(), co.address().sheet()).addresses()),
+        )
 
-            # i -= 1
+    def _next_in_process_queue(self) -> 'sp.Address|None':
+        if len(self._to_calculate) > 0:
+            addr = self._to_calculate.pop()
+            self._graph.close(addr)
+            return addr
 
         try:
             return next(self._to_process)
@@ -255,14 +400,14 @@ class Document():
 
         if co.value_type() in ["float", "percentage"]:
             if co.is_redirect():
-                s += self.text_redirect(co)
+                s += self._render(self.text_redirect, co)
                 self.set_known(addr)
 
             elif co.is_constant():
                 if self.is_known(addr):
                     pass
                 else:
-                    s += self.text_constant(co)
+                    s += self._render(self.text_constant, co)
                     self.set_known(addr)
 
             else:  # is_equation()
@@ -276,12 +421,12 @@ class Document():
                     if self.is_calculated(addr):
                         if not self.is_known(addr):
                             # can this case appear in real?
-                            s += self.text_constant(co)
+                            s += self._render(self.text_constant, co)
                             self.set_known(addr)
                         else:
                             pass
                     else:
-                        dependent: list[sp.Address] = self._COF.get_dependent_addresses_in_order(co.formula(), addr.sheet())[1]
+                        dependent: list[sp.Address] = self._graph.dependencies(co)
 
                         unknown: list[sp.Address] = list(filter(lambda el: not self.is_known(el), dependent))  # if not self.cfg_always_write_where else dependent
                         uncalculated: list[sp.Address] = list(filter(lambda el: not self.is_calculated(el), unknown))
@@ -291,31 +436,31 @@ class Document():
 
                         if can_be_calculated:
                             if self.is_equation_known(addr):
-                                s += self.text_equation_numeric(co, False)
+                                s += self._render(self.text_equation_numeric, co, False)
                                 self.set_calculated(addr)
                             else:
-                                s += self.text_equation_symbolic_numeric(co, self.cfg_allow_symbolic_and_numeric_equation, self.cfg_use_equation_numbers, to_write_where)
+                                s += self._render(self.text_equation_symbolic_numeric, co, self.cfg_allow_symbolic_and_numeric_equation, self.cfg_use_equation_numbers, to_write_where)
                                 self.set_known(addr)
                                 self.set_equation_known(addr)
                                 self.set_calculated(addr)
 
                                 if to_write_where:
-                                    s += self.text_where(unknown)
+                                    s += self._render(self.text_where, unknown)
                                     [self.set_known(a) for a in unknown]
                         else:
                             if self.is_equation_known(addr):
-                                self._to_calculate.insert(-1, co.address())  # append() leads to infinite loop!
-                                pass
+                                self.wait_for_calculated(co.address(), uncalculated)
                                 print(f"Warning: {co.address()}: equation_known, but cannot be calculated because of {uncalculated}")
                             else:
-                                s += self.text_equation_symbolic(co, self.cfg_use_equation_numbers, to_write_where)
+                                s += self._render(self.text_equation_symbolic, co, self.cfg_use_equation_numbers, to_write_where)
                                 self.set_known(addr)
                                 self.set_equation_known(addr)
 
                                 self._to_calculate.append(co.address())
+                                self._graph.open(co.address())
 
                                 if to_write_where:
-                                    s += self.text_where(unknown)
+                                    s += self._render(self.text_where, unknown)
 
                                     [self.set_known(a) for a in unknown]
 
@@ -332,7 +477,7 @@ class Document():
                     print("_process_CO():", co.address(), "---", e, traceback.format_exc())
         elif co.value_type() in ["string", ""]:
             self.set_known(addr)
-            s += self.text_text(co)
+            s += self._render(self.text_text, co)
         else:
             raise Exception(f"Unknown value_type: {repr(co.value_type())} ({addr})")
         return s
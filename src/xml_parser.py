@@ -1,10 +1,25 @@
 import typing
+import re
+import sys
+import codecs
+import xml.parsers.expat
 
 from html import unescape as html_unescape
 
 import str_utils
 
 
+# Функция, решающая по тэгу, пропустить ли его вместе с потомками
+SkipPredicate = typing.Callable[['NodeTag'], bool]
+
+
+# RegExp на открывающий тэг: имя, опции и признак самозакрывающегося тэга
+re_tag_open = re.compile(r'<([^\s/>]+)((?:[^>"\']|"[^"]*"|\'[^\']*\')*?)(/?)>')
+
+# RegExp на опцию тэга: имя и значение в двойных или одинарных кавычках
+re_tag_option = re.compile(r'([^\s=]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+
 def parse_xml(
 		text: str
 		) -> 'list[Node]':
@@ -12,7 +27,173 @@ def parse_xml(
 		Читает строку с XML.
 
 		Возвращает `list` со всеми `Node`. Де-факто возвращает список XML-элементов, \
-		которые являются потомками (`children`) к корню документа. Рекурсивно.
+		которые являются потомками (`children`) к корню документа.
+
+		Проходит строку один раз по индексам, без копирования содержимого тэгов \
+		и без рекурсии: открытые тэги хранятся в стеке.
+	"""
+	builder = _TokenizerTreeBuilder()
+	builder.feed(text, True)
+	return builder.result()
+
+
+class _TokenizerTreeBuilder():
+	"""
+		Строит дерево `Node`, разбирая XML на чистом Python. Данные можно \
+		подавать частями через `feed()`: незаконченный в конце части тэг или \
+		текст откладывается до следующего вызова.
+
+		Тэги, для которых `skip` возвращает `True`, пропускаются вместе \
+		со всеми потомками, без создания `Node`.
+	"""
+	def __init__(self, skip: 'SkipPredicate|None' = None) -> None:
+		self._root: list[Node] = []
+		self._stack: list[NodeTag] = []
+		self._children: list[Node] = self._root
+		self._buffer: str = ""
+		self._offset: int = 0  # позиция начала `_buffer` в документе
+		self._skip: 'SkipPredicate|None' = skip
+		self._skip_depth: int = 0
+
+	def feed(self, data: str, is_final: bool = False) -> None:
+		text = self._buffer + data if self._buffer != "" else data
+		i = self._parse(text, is_final)
+		self._buffer = text[i:]
+		self._offset += i
+
+		if is_final:
+			if len(self._stack) > 0:
+				raise Exception(f"Unclosed tag '{self._stack[-1].name}'")
+
+	def result(self) -> 'list[Node]':
+		return self._root
+
+	def _parse(self, text: str, is_final: bool) -> int:
+		"""
+			Разбирает все законченные элементы `text`. Возвращает позицию, \
+			с которой начинается незаконченный остаток.
+		"""
+		stack = self._stack
+		children = self._children
+
+		i = 0
+		n = len(text)
+		while i < n:
+			j = text.find("<", i)
+			if j == -1:
+				if not is_final:
+					break
+				j = n
+
+			if j > i:
+				# текст вне корневого тэга (переводы строк) не сохраняется, как и в `expat`
+				if self._skip_depth == 0 and len(stack) > 0:
+					children.append(NodeText(_unescape(text[i:j])))
+				i = j
+			if j == n:
+				break
+
+			c = text[j + 1 : j + 2]
+			if c == "/":
+				k = self._find_end(text, ">", j, is_final)
+				if k == -1:
+					break
+				if self._skip_depth > 0:
+					self._skip_depth -= 1
+				else:
+					name = text[j + 2 : k - 1].strip()
+					if len(stack) == 0 or stack[-1].name != name:
+						raise Exception(f"Unexpected closing tag '{name}' at position {self._offset + j}")
+					node = stack.pop()
+					if len(node.children) == 0:
+						node.children = NO_CHILDREN
+					children = stack[-1].children if len(stack) > 0 else self._root
+			elif c == "?":
+				k = self._find_end(text, "?>", j, is_final)
+			elif text.startswith("<!--", j):
+				k = self._find_end(text, "-->", j, is_final)
+			elif text.startswith("<![CDATA[", j):
+				k = self._find_end(text, "]]>", j, is_final)
+				if k != -1 and self._skip_depth == 0:
+					children.append(NodeText(text[j + 9 : k - 3]))
+			elif c == "!" or c == "":
+				k = self._find_end(text, ">", j, is_final)
+			else:
+				m = re_tag_open.match(text, j)
+				if m is None:
+					if not is_final:
+						break
+					raise Exception(f"Bad tag at position {self._offset + j}")
+				is_empty_tag = m.group(3) != ""
+				k = m.end()
+				if self._skip_depth > 0:
+					if not is_empty_tag:
+						self._skip_depth += 1
+					i = k
+					continue
+				node = NodeTag(sys.intern(m.group(1)), None, raw_options=m.group(2))
+				if self._skip is not None and self._skip(node):
+					if not is_empty_tag:
+						self._skip_depth = 1
+					i = k
+					continue
+				children.append(node)
+				if not is_empty_tag:
+					node.children = []
+					stack.append(node)
+					children = node.children
+
+			if k == -1:
+				break
+			i = k
+
+		self._children = children
+		return i
+
+	def _find_end(self, text: str, end: str, start_i: int, is_final: bool) -> int:
+		i = text.find(end, start_i)
+		if i == -1:
+			if is_final:
+				raise Exception(f"Cannot find '{end}' after position {self._offset + start_i}")
+			return -1
+		return i + len(end)
+
+
+def _unescape(text: str) -> str:
+	return html_unescape(text) if "&" in text else text
+
+
+def _find_option(text: str, name: str) -> 'str|None':
+	"""
+		Ищет значение опции `name` в сыром тексте опций тэга, не разбирая \
+		остальные опции в словарь. Возвращает `None`, если опции нет.
+	"""
+	if not name in text:
+		return None
+	for m in re_tag_option.finditer(text):
+		if m.group(1) == name:
+			value = m.group(2) if m.group(3) is None else m.group(3)
+			return _unescape(value)
+	return None
+
+
+def _parse_options(text: str) -> dict[str, str]:
+	options: dict[str, str] = {}
+	for m in re_tag_option.finditer(text):
+		value = m.group(2) if m.group(3) is None else m.group(3)
+		options[sys.intern(m.group(1))] = _unescape(value)
+	return options
+
+
+def parse_xml_recursive(
+		text: str
+		) -> 'list[Node]':
+	"""
+		Читает строку с XML. Старая реализация: копирует содержимое каждого тэга \
+		и разбирает его рекурсивно, поэтому работает за квадратичное время \
+		и не различает вложенные друг в друга одноименные тэги.
+
+		Возвращает `list` со всеми `Node`. Рекурсивно.
 	"""
 	result: list[Node] = []
 
@@ -21,7 +202,7 @@ def parse_xml(
 		txt_pre, i = str_utils.slice_until(text, ["<"], i)
 
 		if txt_pre != "":
-			result.append(NodeText(html_unescape(txt_pre)))
+			result.append(NodeText(_unescape(txt_pre)))
 
 		tag_all, i = str_utils.slice_until(text, [">"], i)
 
@@ -38,12 +219,157 @@ def parse_xml(
 				tag_end = f"</{tag}>"
 				inner, i = str_utils.slice_until(text, [tag_end], i)
 				node = NodeTag(tag, NodeTag.parse_options(tag_options))
-				node.children = parse_xml(inner)
+				node.children = parse_xml_recursive(inner)
 				result.append(node)
 
 	return result
 
 
+def parse_xml_expat(
+		text: 'str|bytes'
+		) -> 'list[Node]':
+	"""
+		Читает строку (или байты) с XML с помощью C-парсера `expat` из стандартной \
+		библиотеки.
+
+		Возвращает `list` со всеми `Node` - то же дерево, что и `parse_xml()`. \
+		Сущности (`&amp;` и т.п.) раскрываются `expat`-ом как в тексте, \
+		так и в значениях опций тэгов.
+	"""
+	builder = _ExpatTreeBuilder()
+	builder.feed(text, True)
+	return builder.result()
+
+
+# Общий для всех `_ExpatTreeBuilder` словарь интернированных имен тэгов и опций
+_expat_interned_names: dict[str, str] = {}
+
+
+class _ExpatTreeBuilder():
+	"""
+		Строит дерево `Node` по событиям `expat`. Данные можно подавать частями \
+		через `feed()`.
+
+		Тэги, для которых `skip` возвращает `True`, пропускаются вместе \
+		со всеми потомками, без создания `Node`.
+	"""
+	def __init__(self, skip: 'SkipPredicate|None' = None) -> None:
+		self._root: list[Node] = []
+		self._stack: list[list[Node]] = [self._root]
+		self._nodes: list[NodeTag] = []
+		self._text: list[str] = []
+		self._skip: 'SkipPredicate|None' = skip
+		self._skip_depth: int = 0
+
+		# `expat` сам интернирует имена тэгов и опций в словаре `intern`
+		self._parser = xml.parsers.expat.ParserCreate(intern=_expat_interned_names)
+		self._parser.buffer_text = True
+		self._set_handlers()
+
+	def feed(self, data: 'str|bytes', is_final: bool = False) -> None:
+		self._parser.Parse(data, is_final)
+
+	def result(self) -> 'list[Node]':
+		self._flush_text()
+		return self._root
+
+	def _set_handlers(self) -> None:
+		if self._skip_depth == 0:
+			self._parser.StartElementHandler = self._start
+			self._parser.EndElementHandler = self._end
+			self._parser.CharacterDataHandler = self._text.append
+		else:
+			self._parser.StartElementHandler = self._start_skipped
+			self._parser.EndElementHandler = self._end_skipped
+			self._parser.CharacterDataHandler = None
+
+	def _flush_text(self) -> None:
+		if len(self._text) > 0:
+			self._stack[-1].append(NodeText("".join(self._text)))
+			self._text.clear()
+
+	def _start(self, name: str, attrs: dict[str, str]) -> None:
+		self._flush_text()
+		node = NodeTag(name, attrs)
+		if self._skip is not None and self._skip(node):
+			self._skip_depth = 1
+			self._set_handlers()
+			return
+		node.children = []
+		self._stack[-1].append(node)
+		self._stack.append(node.children)
+		self._nodes.append(node)
+
+	def _end(self, name: str) -> None:
+		self._flush_text()
+		self._stack.pop()
+		node = self._nodes.pop()
+		if len(node.children) == 0:
+			node.children = NO_CHILDREN
+
+	def _start_skipped(self, name: str, attrs: dict[str, str]) -> None:
+		self._skip_depth += 1
+
+	def _end_skipped(self, name: str) -> None:
+		self._skip_depth -= 1
+		if self._skip_depth == 0:
+			self._set_handlers()
+
+
+# Парсеры XML, которые можно выбрать по имени (см. `main.py`)
+XML_PARSERS: 'dict[str, typing.Callable[[str], list[Node]]]' = {
+	"python": parse_xml,
+	"python_recursive": parse_xml_recursive,
+	"expat": parse_xml_expat,
+}
+
+DEFAULT_XML_PARSER: str = "expat"
+
+# Парсеры XML, умеющие читать документ частями (см. `parse_xml_stream()`)
+XML_STREAM_BUILDERS: 'dict[str, typing.Callable[[SkipPredicate|None], _TokenizerTreeBuilder|_ExpatTreeBuilder]]' = {
+	"python": _TokenizerTreeBuilder,
+	"expat": _ExpatTreeBuilder,
+}
+
+# Размер части (в байтах), которыми `parse_xml_stream()` читает поток
+XML_STREAM_CHUNK_SIZE: int = 1 << 16
+
+
+def parse_xml_stream(
+		stream: typing.BinaryIO,
+		parser_name: str = DEFAULT_XML_PARSER,
+		chunk_size: int = XML_STREAM_CHUNK_SIZE,
+		skip: 'SkipPredicate|None' = None,
+		) -> 'list[Node]':
+	"""
+		Читает XML в кодировке UTF-8 из бинарного потока (например, из \
+		`zipfile.ZipFile.open()`) частями по `chunk_size` байт, декодирует их \
+		и сразу передает парсеру `parser_name`. Весь документ целиком в памяти \
+		(ни в байтах, ни в строке) не хранится.
+
+		Тэги, для которых `skip` возвращает `True`, пропускаются вместе \
+		со всеми потомками, без создания `Node`.
+
+		Парсеры, которые не умеют читать частями, получают документ целиком \
+		(и `skip` не учитывают).
+
+		Возвращает `list` со всеми `Node`, как `parse_xml()`.
+	"""
+	decoder = codecs.getincrementaldecoder("utf-8-sig")()
+
+	if not parser_name in XML_STREAM_BUILDERS:
+		return XML_PARSERS[parser_name](decoder.decode(stream.read(), True))
+
+	builder = XML_STREAM_BUILDERS[parser_name](skip)
+	while True:
+		b = stream.read(chunk_size)
+		is_final = len(b) == 0
+		builder.feed(decoder.decode(b, is_final), is_final)
+		if is_final:
+			break
+	return builder.result()
+
+
 def pretty_print_xml(nodes: 'list[Node]', tab: int = 0) -> None:
 	"""
 		Печатает с помощью `print()` дерево XML-документов. Рекурсивно.
@@ -78,13 +404,21 @@ def iterate_text(l: 'list[Node]') -> 'typing.Iterator[str]':
 
 
 
+# Общий пустой список потомков для текстовых элементов и тэгов без потомков
+NO_CHILDREN: 'tuple[Node, ...]' = ()
+
+
 class Node():
 	"""
 		Интерфейс элемента XML (тэга или текста между открывающим \
 		и закрывающим тэгами).
+
+		У элементов без потомков `children` - общий пустой кортеж `NO_CHILDREN`, \
+		а не отдельный пустой `list`.
 	"""
-	def __init__(self) -> None:
-		self.children: list[Node] = []
+	__slots__ = ()
+
+	children: 'list[Node]|tuple[Node, ...]' = NO_CHILDREN
 
 
 class NodeText(Node):
@@ -92,8 +426,9 @@ class NodeText(Node):
 		Элемент XML, представляющий текст (`text`) между открывающим \
 		и закрывающим тэгами.
 	"""
+	__slots__ = ("text",)
+
 	def __init__(self, text: str = "") -> None:
-		super().__init__()
 		self.text: str = text
 
 	def __repr__(self) -> str:
@@ -105,19 +440,45 @@ class NodeTag(Node):
 		Элемент XML, представляющий тэг с именем (`name`), опциями (`options` - \
 		словарь с названиями опций и их значениями) и потомками (`children` - \
 		массив XML-элементов между открывающим и закрывающим тэгами).
+
+		Имя тэга и названия опций интернированы (`sys.intern()`), так что \
+		одинаковые строки в тысячах тэгов не дублируются.
+
+		Опции можно передать в виде сырого текста (`raw_options`) - тогда они \
+		разбираются только при первом обращении к `options`. `get_option()` \
+		и `has_option()` до этого ищут одну опцию в сыром тексте, не строя словарь.
 	"""
-	def __init__(self, name: str, options: dict[str, str]) -> None:
-		super().__init__()
+	__slots__ = ("name", "_options", "_raw_options", "children")
+
+	def __init__(
+			self,
+			name: str,
+			options: 'dict[str, str]|None',
+			children: 'list[Node]|tuple[Node, ...]' = NO_CHILDREN,
+			raw_options: str = "",
+			) -> None:
 		self.name: str = name
-		self.options: dict[str, str] = options
+		self._options: 'dict[str, str]|None' = options
+		self._raw_options: str = raw_options
+		self.children: 'list[Node]|tuple[Node, ...]' = children
+
+	@property
+	def options(self) -> dict[str, str]:
+		if self._options is None:
+			self._options = _parse_options(self._raw_options)
+			self._raw_options = ""
+		return self._options
 
 	def has_option(self, name: str) -> bool:
-		return name in self.options
+		if self._options is None:
+			return _find_option(self._raw_options, name) is not None
+		return name in self._options
 
 	def get_option(self, name: str, default_value = "") -> str:
-		if self.has_option(name):
-			return self.options[name]
-		return default_value
+		if self._options is None:
+			value = _find_option(self._raw_options, name)
+			return default_value if value is None else value
+		return self._options.get(name, default_value)
 
 	@staticmethod
 	def parse_options(text: str) -> dict[str, str]:
@@ -146,3 +507,24 @@ class NodeTag(Node):
 			return ""
 		return f'</{self.name}>'
 
+
+
+if __name__ == "__main__":
+	# Сравнение скорости парсеров XML:
+	#     python xml_parser.py [<ods-or-xml-file>]
+	import time
+	import zipfile
+
+	filename = sys.argv[1] if len(sys.argv) > 1 else "../tests/calc.ods"
+	if zipfile.is_zipfile(filename):
+		with zipfile.ZipFile(filename, "r") as file:
+			text = str(file.read("content.xml"), encoding="utf-8")
+	else:
+		with open(filename, "r", encoding="utf-8") as file:
+			text = file.read()
+
+	print(f"{filename}: {len(text)} chars")
+	for name, parse in XML_PARSERS.items():
+		t = time.perf_counter()
+		parse(text)
+		print(f"{name:>20}: {time.perf_counter() - t:.3f} s")
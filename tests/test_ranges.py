@@ -0,0 +1,79 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import spreadsheet_parser as sp
+import tex_constructor
+
+
+def make_spreadsheet(formula: str, redirect: str = "") -> sp.Spreadsheet:
+	""" Лист `s`: заголовки, величины x_1..x_4 со значениями 1..4 \
+	и величина S в строке 6 с формулой `formula`. """
+	ss = sp.Spreadsheet()
+	t = ss.create_table("s")
+
+	def put(row: int, column: int, text: str, value = 0.0, formula: str = "", value_type: str = "string") -> None:
+		cell = sp.Cell()
+		cell.init(value, formula, text, value_type)
+		t.set_cell(row, column, cell)
+
+	for j, header in enumerate(["data", "texput", "description", "is_redirect"]):
+		put(0, j, header)
+	for i in range(1, 5):
+		put(i, 0, str(i), float(i), "", "float")
+		put(i, 1, f"x_{i}")
+		put(i, 2, f"величина {i}")
+	put(5, 0, "10", 10.0, formula, "float")
+	put(5, 1, "S")
+	put(5, 2, "сумма")
+	if redirect:
+		put(5, 3, redirect)
+	return ss
+
+
+def render(ss: sp.Spreadsheet) -> str:
+	doc = tex_constructor.Document(ss)
+	doc.process([sp.Address("s", 5, 0)])
+	return doc.string()
+
+
+def test_whole_column_range_is_kept_as_text(capsys):
+	tex = render(make_spreadsheet("SUM([.A:.A])"))
+	assert "= SUM([.A:.A])\n" in tex
+	assert "= 10,0." in tex
+	assert "cannot be dealt with" in capsys.readouterr().out
+
+
+def test_range_over_several_sheets_is_kept_as_text(capsys):
+	tex = render(make_spreadsheet("SUM([$s.A2:$s2.A3])"))
+	assert "= SUM([$s.A2:$s2.A3])\n" in tex
+	assert "= 10,0." in tex
+	assert "cannot be dealt with" in capsys.readouterr().out
+
+
+def test_redirect_with_unsupported_range(capsys):
+	tex = render(make_spreadsheet("SUM([.A:.A])", redirect="x"))
+	assert "= 10,0." in tex
+	assert "bad redirect" in capsys.readouterr().out
+
+
+def test_range_yields_each_row_once():
+	tex = render(make_spreadsheet("SUM([.A2:.B3])"))
+	assert "= SUM(x_1; x_2)\n" in tex
+	assert "= SUM(1; 2)\n" in tex
+
+
+def test_range_skips_headers_row():
+	tex = render(make_spreadsheet("SUM([.A1:.A5])"))
+	assert "= SUM(x_1; x_2; x_3; x_4)\n" in tex
+	assert "= SUM(1; 2; 3; 4)\n" in tex
+	assert "texput" not in tex
+
+
+def test_range_skips_own_row(capsys):
+	tex = render(make_spreadsheet("SUM([.A2:.A6])"))
+	assert "= SUM(x_1; x_2; x_3; x_4)\n" in tex
+	assert "= SUM(1; 2; 3; 4)\n" in tex
+	assert "$S$" not in tex
+	assert "circular dependency on s.A6" in capsys.readouterr().out